@@ -0,0 +1,45 @@
+# Cache keys for analysis results: (remote URL, commit SHA, selected subdirectories, engine version)
+
+import hashlib
+import json
+import subprocess
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class AnalysisCacheKey:
+    repo_url: str
+    commit_sha: str
+    selected_subdirs: tuple
+    engine_version: str
+
+    @property
+    def selection_hash(self):
+        return hashlib.sha256(json.dumps(list(self.selected_subdirs)).encode("utf-8")).hexdigest()
+
+
+def _git(repo_path, *args):
+    try:
+        return subprocess.check_output(["git", *args], cwd=repo_path, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+
+
+def resolve_cache_key(repo_path, repo_url=None, selected_subdirs=None, ref=None):
+    """Build the cache key of a checkout (or of a ref in it), or None when it is not at a commit.
+
+    Without ref, the key assumes a clean checkout, such as the worktrees of the mirror cache.
+    """
+    from backend.report_gen_engines.language_engine import ANALYSIS_ENGINE_VERSION
+
+    commit_sha = _git(repo_path, "rev-parse", "--verify", f"{ref or 'HEAD'}^{{commit}}")
+    if not commit_sha:
+        return None
+    repo_url = repo_url or _git(repo_path, "remote", "get-url", "origin") or ""
+    return AnalysisCacheKey(
+        repo_url=repo_url,
+        commit_sha=commit_sha,
+        selected_subdirs=tuple(sorted(set(selected_subdirs or []))),
+        engine_version=ANALYSIS_ENGINE_VERSION,
+    )
@@ -0,0 +1,158 @@
+# Defines the API endpoints for submitting and tracking background analysis jobs.
+
+import json
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import crud
+from backend.archive_store import get_archive, resolve_archive_key, stream_and_store
+from backend.database import get_db
+from backend.handlers.mirror_handler import resolve_worktree
+from backend.handlers.zip_handler import stream_zip
+from backend.job_queue import QueueFullError, analysis_jobs
+
+try:
+    # Installed separately (backend/src/backend/research_crew), with crewai
+    from research_crew.streaming import stream_report
+except ImportError:
+    stream_report = None
+
+router = APIRouter()
+
+
+class AnalysisRequest(BaseModel):
+    worktree: str  # Identifier of the worktree to analyze (see get_worktree_id)
+    repo_url: str | None = None  # Defaults to the checkout's origin remote
+    selected_subdirs: list[str] = []  # Empty means the whole repository
+    ref: str | None = None  # Branch or commit read from the object database, without checkout
+    compare_branches: list[str] | None = None  # Compare these branches (empty: all) with the default one
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "stage": job.stage,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def resolve_selection(worktree, subdirs):
+    """Path of a worktree under WORKTREE_ROOT, after checking the selected subdirectories stay inside it."""
+    base_path = resolve_worktree(worktree)
+    if base_path is None:
+        raise HTTPException(status_code=404, detail="Worktree not found")
+    for subdir in subdirs:
+        # Selections come from the client: keep them inside the checkout
+        full_path = os.path.realpath(os.path.join(base_path, subdir))
+        if os.path.commonpath([base_path, full_path]) != base_path or full_path == base_path:
+            raise HTTPException(status_code=400, detail=f"Invalid subdirectory: {subdir}")
+    return base_path
+
+
+@router.post("/analyze", status_code=202)
+async def submit_analysis(request: AnalysisRequest):
+    """Queue the analysis of a worktree; only checkouts under WORKTREE_ROOT can be analyzed."""
+    repo_path = resolve_selection(request.worktree, request.selected_subdirs)
+    try:
+        job_id, cached = await analysis_jobs.submit(
+            repo_path, request.repo_url, request.selected_subdirs, request.ref,
+            request.compare_branches)
+    except QueueFullError:
+        # Backpressure: tell the client to come back instead of holding the request open
+        raise HTTPException(status_code=429, detail="Analysis queue is full, retry later",
+                            headers={"Retry-After": "30"})
+    return {"job_id": job_id, "status": "succeeded" if cached else "queued", "cached": cached}
+
+
+@router.get("/analyze/{job_id}")
+async def get_analysis_status(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await crud.get_analysis_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    return serialize_job(job)
+
+
+@router.get("/analyze/{job_id}/result")
+async def get_analysis_result(job_id: str, partial: bool = False, db: AsyncSession = Depends(get_db)):
+    """The result of a finished job; with partial, the results of the detectors done so far while it runs."""
+    job = await crud.get_analysis_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    if partial and job.status in ("queued", "running"):
+        return job.result or {}
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Analysis job is {job.status}")
+    return job.result
+
+
+def format_sse(event):
+    """One server-sent event: the event type, then the event as JSON."""
+    return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+@router.get("/analyze/{job_id}/report")
+async def stream_analysis_report(job_id: str, retry: bool = False, description: str = "",
+                                 db: AsyncSession = Depends(get_db)):
+    """Server-sent events of the research crew writing the report of a finished analysis.
+
+    Generated text arrives as "token" events while the model writes it;
+    the complete report follows as a "report" event. description is the
+    user's own description of the project, given to the crew. The crew runs
+    once per job and description: reconnecting clients get the events of
+    that run from the start, and a failed run is only started again with retry.
+    """
+    job = await crud.get_analysis_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Analysis job is {job.status}")
+    if stream_report is None:
+        raise HTTPException(status_code=503, detail="Report generation requires the research_crew package")
+    return StreamingResponse(
+        (format_sse(event) for event in stream_report(job_id, job.result, retry, description)),
+        media_type="text/event-stream",
+        # Proxies must pass events on as they come
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@router.post("/analyze/{job_id}/cancel")
+async def cancel_analysis(job_id: str, db: AsyncSession = Depends(get_db)):
+    if not await analysis_jobs.cancel(job_id):
+        job = await crud.get_analysis_job(db, job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Analysis job not found")
+        raise HTTPException(status_code=409, detail=f"Analysis job is already {job.status}")
+    return {"job_id": job_id, "status": "cancelling"}
+
+
+@router.get("/archive")
+def download_archive(worktree: str, subdirs: list[str] = Query(default=[])):
+    """Stream a zip of the selected subdirectories of a worktree as it is being compressed.
+
+    The worktree is named by its identifier (see get_worktree_id), so only
+    checkouts under WORKTREE_ROOT can be downloaded. Archives are stored by
+    commit and selection, so a repeated download is served from disk.
+    """
+    if not subdirs:
+        raise HTTPException(status_code=400, detail="No subdirectories selected")
+    base_path = resolve_selection(worktree, subdirs)
+
+    key = resolve_archive_key(base_path, subdirs)
+    stored = get_archive(key) if key else None
+    if stored:
+        return FileResponse(stored, media_type="application/zip", filename="selected_subdirectories.zip",
+                            headers={"X-Archive-Cache": "hit"})
+    chunks = stream_and_store(key, base_path, subdirs) if key else stream_zip(base_path, subdirs)
+    return StreamingResponse(
+        chunks, media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="selected_subdirectories.zip"',
+                 "X-Archive-Cache": "miss"})
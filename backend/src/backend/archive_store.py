@@ -0,0 +1,117 @@
+# Selection archives stored by content: (commit SHA, selected subdirectories, ignore rules, format)
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+import uuid
+
+from backend.core.config import ARCHIVE_STORE_MAX_BYTES, ARCHIVE_STORE_ROOT
+from backend.handlers.mirror_handler import WORKTREE_ROOT
+from backend.handlers.zip_handler import (
+    ARCHIVE_FORMAT_VERSION, ZIP_COMPRESSION_LEVEL, ZIP_IGNORED_DIRS, stream_zip)
+
+# Eviction frees space down to this fraction of the budget, so it does not run on every store
+EVICTION_TARGET_RATIO = 0.9
+
+_eviction_lock = threading.Lock()
+
+
+def archive_key(commit_sha, selected_subdirs, ignored_dirs=ZIP_IGNORED_DIRS):
+    """Content address of the archive of a selection at a commit."""
+    identity = {
+        "commit": commit_sha,
+        "subdirs": sorted({subdir.strip("/") for subdir in selected_subdirs}),
+        "ignored_dirs": sorted(ignored_dirs),
+        "format": ARCHIVE_FORMAT_VERSION,
+        "level": ZIP_COMPRESSION_LEVEL,
+    }
+    return hashlib.sha256(json.dumps(identity).encode("utf-8")).hexdigest()
+
+
+def resolve_archive_key(repo_path, selected_subdirs, ignored_dirs=ZIP_IGNORED_DIRS):
+    """Key of a checkout's selection, or None when it is not at a commit or the store is disabled.
+
+    Like the analysis cache, this assumes a clean checkout such as the worktrees of the mirror cache;
+    only those are stored, so nothing outside WORKTREE_ROOT is ever kept or served by the store.
+    """
+    if ARCHIVE_STORE_MAX_BYTES <= 0:
+        return None
+    root, repo_path = os.path.realpath(WORKTREE_ROOT), os.path.realpath(repo_path)
+    if os.path.commonpath([root, repo_path]) != root or repo_path == root:
+        return None
+    try:
+        commit_sha = subprocess.check_output(["git", "rev-parse", "--verify", "HEAD^{commit}"], cwd=repo_path,
+                                             text=True, stderr=subprocess.DEVNULL).strip()
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+    return archive_key(commit_sha, selected_subdirs, ignored_dirs)
+
+
+def archive_path(key):
+    return os.path.join(ARCHIVE_STORE_ROOT, key[:2], f"{key}.zip")
+
+
+def get_archive(key):
+    """Path of a stored archive, marked as recently used, or None."""
+    path = archive_path(key)
+    try:
+        os.utime(path)  # The modification time orders eviction
+    except OSError:
+        return None
+    return path
+
+
+def stream_and_store(key, base_path, selected_subdirs, ignored_dirs=ZIP_IGNORED_DIRS):
+    """Yield the archive chunks while writing them to the store.
+
+    The archive only becomes visible once complete, so an interrupted download
+    leaves nothing behind. Concurrent builds of one key are harmless: they
+    produce the same archive and the last rename wins.
+    """
+    path = archive_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    complete = False
+    try:
+        with open(temp_path, "wb") as f:
+            for chunk in stream_zip(base_path, selected_subdirs, ignored_dirs):
+                f.write(chunk)
+                yield chunk
+        os.replace(temp_path, path)
+        complete = True
+        evict_archives()
+    finally:
+        if not complete and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def evict_archives(max_bytes=ARCHIVE_STORE_MAX_BYTES):
+    """Delete the least recently used archives once the store exceeds its budget."""
+    with _eviction_lock:
+        archives = []
+        for root, _, files in os.walk(ARCHIVE_STORE_ROOT):
+            for file in files:
+                if file.endswith(".zip"):
+                    try:
+                        stat = os.stat(os.path.join(root, file))
+                    except OSError:
+                        continue
+                    archives.append((stat.st_mtime, stat.st_size, os.path.join(root, file)))
+        total_size = sum(size for _, size, _ in archives)
+        if total_size <= max_bytes:
+            return
+        excess = total_size - int(max_bytes * EVICTION_TARGET_RATIO)
+        freed, evicted = 0, 0
+        for _, size, path in sorted(archives):
+            if freed >= excess:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            freed += size
+            evicted += 1
+        logging.info(f"Archive store evicted {evicted} archives ({freed} bytes)")
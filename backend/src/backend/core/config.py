@@ -1 +1,14 @@
-# File for Application settings
\ No newline at end of file
+# File for Application settings
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Background analysis jobs: concurrent analyses and how many may wait in line
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "2"))
+ANALYSIS_QUEUE_DEPTH = int(os.getenv("ANALYSIS_QUEUE_DEPTH", "20"))
+
+# Selection archives kept by (commit, subdirectories, ignore rules) and their disk budget
+ARCHIVE_STORE_ROOT = os.path.abspath(os.getenv("ARCHIVE_STORE_ROOT", "./analysis_cache/archives"))
+ARCHIVE_STORE_MAX_BYTES = int(os.getenv("ARCHIVE_STORE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
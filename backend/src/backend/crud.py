@@ -1 +1,69 @@
-# File for Database operations
\ No newline at end of file
+# File for Database operations
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.models import AnalysisJob, AnalysisResult
+
+
+async def create_analysis_job(db: AsyncSession, job_id: str, repo_path: str, **fields) -> AnalysisJob:
+    job = AnalysisJob(id=job_id, repo_path=repo_path, **{"status": "queued", "progress": 0, **fields})
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def get_analysis_job(db: AsyncSession, job_id: str) -> AnalysisJob | None:
+    return await db.get(AnalysisJob, job_id)
+
+
+async def update_analysis_job(db: AsyncSession, job_id: str, **fields) -> None:
+    await db.execute(update(AnalysisJob).where(AnalysisJob.id == job_id).values(**fields))
+    await db.commit()
+
+
+async def fail_unfinished_analysis_jobs(db: AsyncSession) -> None:
+    """Jobs left queued or running by a previous process will never finish."""
+    await db.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.status.in_(["queued", "running"]))
+        .values(status="failed", error="Interrupted by a server restart")
+    )
+    await db.commit()
+
+
+async def get_cached_analysis_result(db: AsyncSession, key) -> AnalysisResult | None:
+    query = select(AnalysisResult).where(
+        AnalysisResult.repo_url == key.repo_url,
+        AnalysisResult.commit_sha == key.commit_sha,
+        AnalysisResult.selection_hash == key.selection_hash,
+        AnalysisResult.engine_version == key.engine_version,
+    )
+    return (await db.execute(query)).scalar_one_or_none()
+
+
+async def store_analysis_result(db: AsyncSession, key, result: dict) -> None:
+    """Save a result, replacing any entry for the same commit and selection made by another engine version."""
+    await db.execute(delete(AnalysisResult).where(
+        AnalysisResult.repo_url == key.repo_url,
+        AnalysisResult.commit_sha == key.commit_sha,
+        AnalysisResult.selection_hash == key.selection_hash,
+    ))
+    db.add(AnalysisResult(
+        repo_url=key.repo_url,
+        commit_sha=key.commit_sha,
+        selection_hash=key.selection_hash,
+        selected_subdirs=list(key.selected_subdirs),
+        engine_version=key.engine_version,
+        result=result,
+    ))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()  # Another job stored the same key first
+
+
+async def purge_stale_analysis_results(db: AsyncSession, engine_version: str) -> None:
+    """Drop cached results computed by older engine versions."""
+    await db.execute(delete(AnalysisResult).where(AnalysisResult.engine_version != engine_version))
+    await db.commit()
@@ -0,0 +1,187 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+
+import git
+
+from backend.handlers.repo_handler import CLONE_MODES, DEFAULT_SHALLOW_DEPTH, make_writable
+
+
+# Bare mirrors, one per remote URL, shared by every analysis of that remote
+MIRROR_ROOT = os.path.abspath(os.getenv("MIRROR_ROOT", "./repo_mirrors"))
+# Per-analysis working trees checked out from the mirrors
+WORKTREE_ROOT = os.path.abspath(os.getenv("WORKTREE_ROOT", "./repo_worktrees"))
+
+# Modes a mirror can be created with (a mirror always tracks every ref)
+MIRROR_MODES = {mode for mode in CLONE_MODES if mode != "single-branch"}
+# From the least to the most complete; a mirror serves requests for its own mode and the ones before it
+MIRROR_MODE_ORDER = ["shallow", "treeless", "blobless", "full"]
+# Partial clone filter of each partial mode
+MIRROR_FILTERS = {
+    mode: option.split("=", 1)[1] for mode in MIRROR_MODES for option in CLONE_MODES[mode]
+    if option.startswith("--filter=")
+}
+
+_mirror_locks = {}
+_mirror_locks_guard = threading.Lock()
+
+
+def _mirror_lock(key):
+    """Serialize clone and fetch of one mirror within this process."""
+    with _mirror_locks_guard:
+        return _mirror_locks.setdefault(key, threading.Lock())
+
+
+def mirror_key(repo_url):
+    """Stable directory name for a remote URL: readable name plus a short URL hash."""
+    name = re.sub(r"\.git$", "", repo_url.rstrip("/").split("/")[-1]) or "repo"
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", name)
+    return f"{name}-{hashlib.sha1(repo_url.encode('utf-8')).hexdigest()[:12]}"
+
+
+def get_mirror_path(repo_url):
+    return os.path.join(MIRROR_ROOT, f"{mirror_key(repo_url)}.git")
+
+
+def get_mirror_mode(repo):
+    """Mode a mirror was created (or last upgraded) with, and its depth if shallow."""
+    config = repo.config_reader()
+    mode = config.get_value("analysis", "mirrormode", "")
+    if mode in MIRROR_MODES:
+        return mode, int(config.get_value("analysis", "mirrordepth", 0))
+    # Mirrors created before the mode was recorded
+    if repo.git.rev_parse("--is-shallow-repository") == "true":
+        return "shallow", 0
+    partial_filter = config.get_value('remote "origin"', "partialclonefilter", "")
+    return next((mode for mode, option in MIRROR_FILTERS.items() if option == partial_filter), "full"), 0
+
+
+def _record_mirror_mode(repo, mode, depth):
+    with repo.config_writer() as config:
+        config.set_value("analysis", "mirrormode", mode)
+        config.set_value("analysis", "mirrordepth", depth if mode == "shallow" else 0)
+
+
+def _upgrade_mirror(repo, current, mode, depth):
+    """Fetch what a mirror of the current mode lacks for mode; returns the mode it has afterwards."""
+    if current == "shallow":
+        if mode == "shallow":
+            repo.git.fetch("--prune", f"--depth={depth}", "origin")
+            return mode
+        # The whole history, with every object: the mirror is a full one afterwards
+        repo.git.fetch("--prune", "--unshallow", "origin")
+        return "full"
+    # Partial mirror: fetch every object again, with the filter of the new mode or without any
+    with repo.config_writer() as config:
+        if mode == "full":
+            config.remove_option('remote "origin"', "partialclonefilter")
+        else:
+            config.set_value('remote "origin"', "partialclonefilter", MIRROR_FILTERS[mode])
+    repo.git.fetch("--prune", "--refetch", "origin")
+    return mode
+
+
+def ensure_mirror(repo_url, mode="full", depth=DEFAULT_SHALLOW_DEPTH):
+    """Create the bare mirror of a remote, or bring an existing one up to date.
+
+    An existing mirror created with a less complete mode (or a smaller depth)
+    than requested is deepened, unshallowed or refetched in place, so the
+    worktrees checked out from it keep working.
+    """
+    if mode not in MIRROR_MODES:
+        return f"❌ Error mirroring repository: unsupported mirror mode '{mode}'"
+
+    mirror_path = get_mirror_path(repo_url)
+    try:
+        with _mirror_lock(mirror_key(repo_url)):
+            if os.path.isdir(mirror_path):
+                repo = git.Repo(mirror_path)
+                current, current_depth = get_mirror_mode(repo)
+                if MIRROR_MODE_ORDER.index(current) > MIRROR_MODE_ORDER.index(mode) or (
+                        current == mode and (mode != "shallow" or current_depth >= depth)):
+                    # Incremental fetch only; worktrees keep using the shared objects
+                    repo.git.fetch("--prune", "origin")
+                    return f"✅ Repository mirror updated successfully: {mirror_path}"
+                mode = _upgrade_mirror(repo, current, mode, depth)
+                _record_mirror_mode(repo, mode, depth)
+                return f"✅ Repository mirror upgraded to {mode} mode: {mirror_path}"
+
+            options = list(CLONE_MODES[mode])
+            if mode == "shallow":
+                options.append(f"--depth={depth}")
+            os.makedirs(MIRROR_ROOT, exist_ok=True)
+            repo = git.Repo.clone_from(repo_url, mirror_path, mirror=True, multi_options=options)
+            _record_mirror_mode(repo, mode, depth)
+            return f"✅ Repository mirrored successfully: {mirror_path}"
+    except Exception as e:
+        return f"❌ Error mirroring repository: {e}"
+
+
+def get_commit_sha(repo_path, ref="HEAD"):
+    """Commit a ref of a mirror or worktree points to, or None."""
+    try:
+        return git.Repo(repo_path).git.rev_parse("--verify", f"{ref}^{{commit}}")
+    except Exception as e:
+        print(f"Error resolving {ref}: {e}")
+        return None
+
+
+def get_mirror_branches(repo_url):
+    """Retrieve all branches of a mirrored remote."""
+    try:
+        repo = git.Repo(get_mirror_path(repo_url))
+        return [head.name for head in repo.heads]
+    except Exception as e:
+        print(f"Error retrieving branches: {e}")
+        return []
+
+
+def add_worktree(repo_url, branch_name):
+    """Check out a branch of the mirror into a new, private worktree and return its path."""
+    safe_branch = re.sub(r"[^A-Za-z0-9._-]", "_", branch_name)
+    worktree_path = os.path.join(
+        WORKTREE_ROOT, mirror_key(repo_url), f"{safe_branch}-{uuid.uuid4().hex[:8]}")
+    try:
+        repo = git.Repo(get_mirror_path(repo_url))
+        os.makedirs(os.path.dirname(worktree_path), exist_ok=True)
+        # Detached, so fetches into the mirror never clash with a checked-out branch
+        repo.git.worktree("add", "--detach", worktree_path, f"refs/heads/{branch_name}")
+        return worktree_path
+    except Exception as e:
+        print(f"Error creating worktree: {e}")
+        return None
+
+
+def get_worktree_id(worktree_path):
+    """Identifier of a worktree for clients: its path below WORKTREE_ROOT, never the server path."""
+    return os.path.relpath(os.path.realpath(worktree_path), os.path.realpath(WORKTREE_ROOT)).replace(os.sep, "/")
+
+
+def resolve_worktree(worktree_id):
+    """Path of the worktree with this identifier, or None unless it is a worktree under WORKTREE_ROOT."""
+    root = os.path.realpath(WORKTREE_ROOT)
+    path = os.path.realpath(os.path.join(root, worktree_id))
+    # Worktrees sit two levels down (mirror, then branch) and have a .git file
+    if os.path.commonpath([root, path]) != root or len(os.path.relpath(path, root).split(os.sep)) != 2:
+        return None
+    return path if os.path.isfile(os.path.join(path, ".git")) else None
+
+
+def remove_worktree(repo_url, worktree_path):
+    """Delete a worktree once its analysis is done; the mirror is kept."""
+    try:
+        repo = git.Repo(get_mirror_path(repo_url))
+        repo.git.worktree("remove", "--force", worktree_path)
+        return f"✅ Worktree removed: {worktree_path}"
+    except Exception as e:
+        if os.path.exists(worktree_path):
+            make_writable(worktree_path)
+            shutil.rmtree(worktree_path, ignore_errors=True)
+        try:
+            git.Repo(get_mirror_path(repo_url)).git.worktree("prune")
+        except Exception:
+            pass
+        return f"❌ Error removing worktree: {e}"
@@ -2,6 +2,20 @@ import os
 import git
 import shutil
 import stat
+import time
+
+
+# Clone strategies: extra `git clone` options for each mode
+CLONE_MODES = {
+    "full": [],
+    # Commits and trees now, file contents fetched lazily when needed
+    "blobless": ["--filter=blob:none"],
+    # Commits only, trees and blobs fetched lazily when needed
+    "treeless": ["--filter=tree:0"],
+    "shallow": ["--no-single-branch"],
+    "single-branch": ["--single-branch"],
+}
+DEFAULT_SHALLOW_DEPTH = 1
 
 
 def make_writable(path):
@@ -13,21 +27,64 @@ def make_writable(path):
             os.chmod(os.path.join(root, file), stat.S_IWRITE)
 
 
-def clone_repository(repo_url, repo_path):
-    """Clones a repository and ensures all branches are fetched."""
+def clone_repository(repo_url, repo_path, mode="full", depth=DEFAULT_SHALLOW_DEPTH, branch=None):
+    """Clones a repository with the given strategy and ensures all branches are fetched."""
+    if mode not in CLONE_MODES:
+        return f"❌ Error cloning repository: unknown clone mode '{mode}'"
+
     try:
         if os.path.exists(repo_path):
             make_writable(repo_path)  # Fix permission issues
             shutil.rmtree(repo_path)  # Remove existing repo
 
-        repo = git.Repo.clone_from(repo_url, repo_path)
-        repo.git.fetch("--all")  # Ensure all remote branches are fetched
-        
+        options = list(CLONE_MODES[mode])
+        if mode == "shallow":
+            options.append(f"--depth={depth}")
+        if branch:
+            options.append(f"--branch={branch}")
+
+        repo = git.Repo.clone_from(repo_url, repo_path, multi_options=options)
+        if mode in ("full", "blobless", "treeless"):
+            repo.git.fetch("--all")  # Ensure all remote branches are fetched
+
         return f"✅ Repository cloned successfully: {repo_path}"
     except Exception as e:
         return f"❌ Error cloning repository: {e}"
 
 
+def get_object_store_size(repo_path):
+    """Total size in bytes of the objects received into a clone."""
+    objects_dir = os.path.join(repo_path, ".git", "objects")
+    if not os.path.isdir(objects_dir):
+        objects_dir = os.path.join(repo_path, "objects")  # Bare repository
+    total = 0
+    for root, _, files in os.walk(objects_dir):
+        for file in files:
+            total += os.path.getsize(os.path.join(root, file))
+    return total
+
+
+def measure_clone(repo_url, repo_path, mode="full", depth=DEFAULT_SHALLOW_DEPTH, branch=None):
+    """Clone a repository and report the wall time and bytes transferred.
+
+    Use a file:// URL for local measurements: a plain path makes git hardlink
+    the objects and ignore --depth/--filter. Partial clones from a local bare
+    repository also need `uploadpack.allowFilter=true` set on it.
+    """
+    start_time = time.perf_counter()
+    message = clone_repository(repo_url, repo_path, mode, depth, branch)
+    elapsed = time.perf_counter() - start_time
+
+    cloned = "successfully" in message
+    return {
+        "mode": mode,
+        "message": message,
+        "seconds": round(elapsed, 3),
+        # Objects written by the clone, i.e. what was fetched from the remote
+        "bytes_transferred": get_object_store_size(repo_path) if cloned else 0,
+    }
+
+
 def get_branches(repo_path):
     """Retrieve all branches (local + remote) in the repository."""
     try:
@@ -1,5 +1,224 @@
 import os
-import zipfile
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Bump when the archive produced for the same files changes; stored archives are keyed on it
+ARCHIVE_FORMAT_VERSION = 3
+
+# Version control metadata and bytecode caches found below the selection; selected paths are always kept
+ZIP_IGNORED_DIRS = frozenset({".git", ".hg", ".svn", ".bzr", "__pycache__"})
+# Already-compressed formats are stored as is: deflating them costs CPU and saves nothing
+STORED_EXTENSIONS = {
+    "zip", "gz", "tgz", "bz2", "xz", "7z", "rar", "zst", "jar", "war", "whl", "apk", "docx", "xlsx",
+    "pptx", "png", "jpg", "jpeg", "gif", "webp", "ico", "mp3", "mp4", "mov", "avi", "mkv", "ogg",
+    "woff", "woff2", "pdf",
+}
+# Smaller files gain nothing from deflate
+MIN_DEFLATE_BYTES = 64
+ZIP_COMPRESSION_LEVEL = int(os.getenv("ZIP_COMPRESSION_LEVEL", "6"))
+# Bytes read (and, for large members, deflated by one thread) at a time
+ZIP_CHUNK_SIZE = 1024 * 1024
+# Members at least this large are deflated block by block on several threads
+PARALLEL_DEFLATE_MIN_BYTES = int(os.getenv("PARALLEL_DEFLATE_MIN_BYTES", str(4 * 1024 * 1024)))
+ZIP_COMPRESS_WORKERS = int(os.getenv("ZIP_COMPRESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Deflate looks back this far, so each parallel block is primed with the previous block's tail
+DEFLATE_WINDOW = 32 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF
+# Flags: sizes and CRC follow the data (streaming), UTF-8 names
+ZIP_FLAGS = 0x08 | 0x800
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<IQHHIIQQQQ")
+ZIP64_LOCATOR = struct.Struct("<IIQI")
+
+
+def iter_archive_files(base_path, selected_subdirs, ignored_dirs=ZIP_IGNORED_DIRS):
+    """Yield (file path, archive name) of the selected subdirectories, skipping ignored directories.
+
+    Symlinks are skipped: a link committed to the repository could point anywhere on the server.
+    """
+    for subdir in sorted(selected_subdirs):
+        full_path = os.path.join(base_path, subdir)
+        if os.path.islink(full_path):
+            continue
+        if os.path.isfile(full_path):
+            yield full_path, os.path.relpath(full_path, base_path).replace(os.sep, "/")
+            continue
+        for root, dirs, files in os.walk(full_path):
+            dirs[:] = sorted(d for d in dirs if d not in ignored_dirs)
+            for file in sorted(files):
+                file_path = os.path.join(root, file)
+                if os.path.islink(file_path):
+                    continue
+                yield file_path, os.path.relpath(file_path, base_path).replace(os.sep, "/")
+
+
+def _dos_datetime(timestamp):
+    t = time.localtime(max(timestamp, 315532800))  # Zip dates start in 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _deflate_block(data, dictionary, final, level):
+    """Raw-deflate one block; blocks joined in order form a single valid deflate stream."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=dictionary) if dictionary else \
+        zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class ZipStreamWriter:
+    """Zip archive produced as a sequence of byte chunks, without seeking.
+
+    Each member is written with a data descriptor, so only the central
+    directory (one small record per member) is kept in memory.
+    """
+
+    def __init__(self, level=ZIP_COMPRESSION_LEVEL, executor=None, workers=1):
+        self.level = level
+        # Thread pool of `workers` threads deflating the blocks of large members
+        self.executor = executor
+        self.workers = workers
+        self.offset = 0
+        self.central_directory = []
+        self.entries = 0
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def _deflate_serial(self, f, crc_sizes):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        while chunk := f.read(ZIP_CHUNK_SIZE):
+            crc_sizes[0] = zlib.crc32(chunk, crc_sizes[0])
+            crc_sizes[2] += len(chunk)
+            data = compressor.compress(chunk)
+            if data:
+                crc_sizes[1] += len(data)
+                yield data
+        data = compressor.flush()
+        crc_sizes[1] += len(data)
+        yield data
+
+    def _deflate_parallel(self, f, crc_sizes):
+        # zlib releases the GIL, so blocks compress concurrently; at most a few are in flight
+        pending = deque()
+        max_pending = self.workers * 2
+        dictionary = b""
+        chunk = f.read(ZIP_CHUNK_SIZE)
+        while chunk:
+            next_chunk = f.read(ZIP_CHUNK_SIZE)
+            crc_sizes[0] = zlib.crc32(chunk, crc_sizes[0])
+            crc_sizes[2] += len(chunk)
+            pending.append(self.executor.submit(_deflate_block, chunk, dictionary, not next_chunk, self.level))
+            dictionary = (dictionary + chunk)[-DEFLATE_WINDOW:]
+            chunk = next_chunk
+            while len(pending) >= max_pending or (pending and not chunk):
+                data = pending.popleft().result()
+                crc_sizes[1] += len(data)
+                yield data
+        if crc_sizes[2] == 0:
+            data = _deflate_block(b"", b"", True, self.level)
+            crc_sizes[1] += len(data)
+            yield data
+
+    def _store(self, f, crc_sizes):
+        while chunk := f.read(ZIP_CHUNK_SIZE):
+            crc_sizes[0] = zlib.crc32(chunk, crc_sizes[0])
+            crc_sizes[1] += len(chunk)
+            crc_sizes[2] += len(chunk)
+            yield chunk
+
+    def add_file(self, file_path, arcname):
+        """Yield the chunks of one member; unreadable files are skipped."""
+        try:
+            f = open(file_path, "rb")
+        except OSError:
+            return
+        with f:
+            stat = os.fstat(f.fileno())
+            extension = os.path.splitext(arcname)[1][1:].lower()
+            stored = extension in STORED_EXTENSIONS or stat.st_size < MIN_DEFLATE_BYTES
+            method = 0 if stored else 8  # Stored or deflated
+            # Deflate may grow incompressible data slightly, hence the margin
+            zip64 = stat.st_size * 1.05 > ZIP64_LIMIT
+            name = arcname.encode("utf-8")
+            dos_time, dos_date = _dos_datetime(stat.st_mtime)
+            version = 45 if zip64 else 20
+            header_offset = self.offset
+
+            extra = struct.pack("<HHQQ", 1, 16, 0, 0) if zip64 else b""
+            yield self._emit(LOCAL_HEADER.pack(
+                0x04034b50, version, ZIP_FLAGS, method, dos_time, dos_date, 0,
+                ZIP64_LIMIT if zip64 else 0, ZIP64_LIMIT if zip64 else 0, len(name), len(extra)) + name + extra)
+
+            crc_sizes = [0, 0, 0]  # CRC-32, compressed size, uncompressed size
+            if stored:
+                body = self._store(f, crc_sizes)
+            elif self.executor is not None and stat.st_size >= PARALLEL_DEFLATE_MIN_BYTES:
+                body = self._deflate_parallel(f, crc_sizes)
+            else:
+                body = self._deflate_serial(f, crc_sizes)
+            for data in body:
+                if data:
+                    yield self._emit(data)
+
+        crc, compressed_size, file_size = crc_sizes
+        descriptor_format = "<IIQQ" if zip64 else "<IIII"
+        yield self._emit(struct.pack(descriptor_format, 0x08074b50, crc, compressed_size, file_size))
+
+        # Central directory record: a member with a zip64 local header gets a zip64 extra field here too
+        zip64_values = [file_size, compressed_size] if zip64 else []
+        if header_offset >= ZIP64_LIMIT:
+            zip64_values.append(header_offset)
+        extra = struct.pack(f"<HH{len(zip64_values)}Q", 1, 8 * len(zip64_values), *zip64_values) \
+            if zip64_values else b""
+        version = 45 if zip64_values else 20
+        if zip64:
+            compressed_size = file_size = ZIP64_LIMIT
+        self.central_directory.append(CENTRAL_HEADER.pack(
+            0x02014b50, (3 << 8) | version, version, ZIP_FLAGS, method, dos_time, dos_date, crc,
+            compressed_size, file_size, len(name), len(extra), 0, 0, 0,
+            (stat.st_mode & 0xFFFF) << 16, min(header_offset, ZIP64_LIMIT)) + name + extra)
+        self.entries += 1
+
+    def finish(self):
+        """The central directory and end records that close the archive."""
+        directory = b"".join(self.central_directory)
+        directory_offset = self.offset
+        trailer = b""
+        if self.entries >= 0xFFFF or directory_offset >= ZIP64_LIMIT or len(directory) >= ZIP64_LIMIT:
+            zip64_offset = directory_offset + len(directory)
+            trailer += ZIP64_END_OF_CENTRAL_DIRECTORY.pack(
+                0x06064b50, 44, 45, 45, 0, 0, self.entries, self.entries, len(directory), directory_offset)
+            trailer += ZIP64_LOCATOR.pack(0x07064b50, 0, zip64_offset, 1)
+        trailer += END_OF_CENTRAL_DIRECTORY.pack(
+            0x06054b50, 0, 0, min(self.entries, 0xFFFF), min(self.entries, 0xFFFF),
+            min(len(directory), ZIP64_LIMIT), min(directory_offset, ZIP64_LIMIT), 0)
+        self.central_directory = []
+        return self._emit(directory + trailer)
+
+
+def stream_zip(base_path, selected_subdirs, ignored_dirs=ZIP_IGNORED_DIRS, workers=ZIP_COMPRESS_WORKERS):
+    """Yield a zip archive of the selected subdirectories chunk by chunk.
+
+    Memory stays bounded by a few compression blocks whatever the selection
+    size, so the chunks can go straight to an HTTP response or a file.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zip") if workers > 1 else None
+    try:
+        writer = ZipStreamWriter(executor=executor, workers=workers)
+        for file_path, arcname in iter_archive_files(base_path, selected_subdirs, ignored_dirs):
+            yield from writer.add_file(file_path, arcname)
+        yield writer.finish()
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
 
 
 def zipper(base_path, selected_subdirs, output_zip):
@@ -8,16 +227,9 @@ def zipper(base_path, selected_subdirs, output_zip):
         return None
 
     try:
-        with zipfile.ZipFile(output_zip, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for subdir in selected_subdirs:
-                full_path = os.path.join(base_path, subdir)
-                if not os.path.exists(full_path):
-                    continue
-                for root, _, files in os.walk(full_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        zipf.write(file_path, os.path.relpath(
-                            file_path, base_path))
+        with open(output_zip, "wb") as zipf:
+            for chunk in stream_zip(base_path, selected_subdirs):
+                zipf.write(chunk)
         return output_zip
     except Exception as e:
         return f"Error zipping subdirectories: {e}"
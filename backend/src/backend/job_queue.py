@@ -0,0 +1,169 @@
+# Background analysis jobs: a bounded queue drained by a fixed pool of workers
+
+import asyncio
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from backend import crud
+from backend.analysis_cache import resolve_cache_key
+from backend.core.config import ANALYSIS_QUEUE_DEPTH, ANALYSIS_WORKERS
+from backend.database import SessionLocal
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+class AnalysisCancelled(Exception):
+    """Raised inside a running analysis once its job has been cancelled."""
+
+
+class AnalysisJobQueue:
+    def __init__(self, workers=ANALYSIS_WORKERS, queue_depth=ANALYSIS_QUEUE_DEPTH):
+        self.workers = max(1, workers)
+        self.queue_depth = max(1, queue_depth)
+        self._queue = None
+        self._tasks = []
+        self._cancel_events = {}
+        # Analyses are blocking (subprocesses, disk I/O), so they run off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+
+    async def start(self):
+        from backend.report_gen_engines.language_engine import ANALYSIS_ENGINE_VERSION
+
+        async with SessionLocal() as db:
+            await crud.fail_unfinished_analysis_jobs(db)
+            await crud.purge_stale_analysis_results(db, ANALYSIS_ENGINE_VERSION)
+        self._queue = asyncio.Queue(maxsize=self.queue_depth)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for event in self._cancel_events.values():
+            event.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def submit(self, repo_path, repo_url=None, selected_subdirs=None, ref=None,
+                     compare_branches=None):
+        """Queue an analysis and return (job ID, served from cache), or raise QueueFullError.
+
+        A result cached for the same commit, selection and engine version is
+        returned as an already succeeded job without queueing anything. With
+        compare_branches (a list of branches, empty for all), the job builds a
+        branch comparison report instead, which is not cached.
+        """
+        job_id = str(uuid.uuid4())
+        cache_key = None
+        if compare_branches is None:
+            cache_key = await asyncio.to_thread(resolve_cache_key, repo_path, repo_url, selected_subdirs, ref)
+        request = {"repo_path": repo_path, "selected_subdirs": selected_subdirs, "ref": ref,
+                   "compare_branches": compare_branches, "cache_key": cache_key}
+
+        async with SessionLocal() as db:
+            cached = await crud.get_cached_analysis_result(db, cache_key) if cache_key else None
+            if cached is not None:
+                now = datetime.now()
+                await crud.create_analysis_job(
+                    db, job_id, repo_path, status="succeeded", progress=100, stage="cache",
+                    result=cached.result, started_at=now, finished_at=now)
+                return job_id, True
+
+            if self._queue.full():
+                raise QueueFullError()
+            await crud.create_analysis_job(db, job_id, repo_path)
+            self._cancel_events[job_id] = threading.Event()
+            try:
+                self._queue.put_nowait((job_id, request))
+            except asyncio.QueueFull:
+                self._cancel_events.pop(job_id)
+                await crud.update_analysis_job(
+                    db, job_id, status="failed", error="Analysis queue is full")
+                raise QueueFullError()
+        return job_id, False
+
+    async def cancel(self, job_id):
+        """Cancel a queued or running job. Returns False if it already finished."""
+        event = self._cancel_events.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        async with SessionLocal() as db:
+            job = await crud.get_analysis_job(db, job_id)
+            if job and job.status == "queued":
+                await crud.update_analysis_job(
+                    db, job_id, status="cancelled", finished_at=datetime.now())
+        return True
+
+    async def _update(self, job_id, **fields):
+        async with SessionLocal() as db:
+            await crud.update_analysis_job(db, job_id, **fields)
+
+    async def _worker(self):
+        while True:
+            job_id, request = await self._queue.get()
+            try:
+                if not self._cancel_events[job_id].is_set():
+                    await self._run(job_id, request)
+            except Exception:
+                logging.exception(f"Analysis job {job_id} could not be recorded")
+            finally:
+                self._cancel_events.pop(job_id, None)
+                self._queue.task_done()
+
+    async def _run(self, job_id, request):
+        loop = asyncio.get_running_loop()
+        await self._update(job_id, status="running", started_at=datetime.now())
+        try:
+            result = await loop.run_in_executor(
+                self._executor, self._analyze, job_id, request, loop)
+        except AnalysisCancelled:
+            await self._update(job_id, status="cancelled", finished_at=datetime.now())
+        except Exception as e:
+            logging.exception(f"Analysis job {job_id} failed")
+            await self._update(job_id, status="failed", error=str(e), finished_at=datetime.now())
+        else:
+            if request["cache_key"] is not None:
+                async with SessionLocal() as db:
+                    await crud.store_analysis_result(db, request["cache_key"], result)
+            await self._update(job_id, status="succeeded", progress=100,
+                               result=result, finished_at=datetime.now())
+
+    def _analyze(self, job_id, request, loop):
+        """Run in a worker thread; reports progress and checks for cancellation per stage."""
+        from backend.report_gen_engines.branch_report import compare_branches
+        from backend.report_gen_engines.language_engine import analyze_folder
+
+        cancel_event = self._cancel_events[job_id]
+        if cancel_event.is_set():
+            raise AnalysisCancelled()
+
+        progress_updates = []
+        # Results of the stages done so far, readable while the job runs
+        partial_result = {}
+
+        def on_stage_complete(stage, result, completed, total):
+            if cancel_event.is_set():
+                raise AnalysisCancelled()
+            partial_result[stage] = result
+            progress_updates.append(asyncio.run_coroutine_threadsafe(
+                self._update(job_id, stage=stage, progress=int(completed * 100 / total),
+                             result=dict(partial_result)), loop))
+
+        try:
+            if request["compare_branches"] is not None:
+                return compare_branches(request["repo_path"], request["compare_branches"] or None,
+                                        on_branch_complete=on_stage_complete)
+            return analyze_folder(request["repo_path"], None, on_stage_complete=on_stage_complete,
+                                  selected_subdirs=request["selected_subdirs"], ref=request["ref"])
+        finally:
+            # Let progress writes land before the final status is recorded
+            for update in progress_updates:
+                update.result()
+
+
+analysis_jobs = AnalysisJobQueue()
@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 from backend.database import engine, Base
 from backend.handlers import git_summary_handler
+from backend.api import routes
+from backend.job_queue import analysis_jobs
+import backend.models  # Registers the ORM tables on Base.metadata
 
 
 import asyncio
@@ -12,15 +15,20 @@ app = FastAPI()
 async def startup():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # Start the background analysis workers
+    await analysis_jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await analysis_jobs.stop()
 
 @app.get("/")
 async def read_root():
     return {"message": "FastAPI Backend is running!"}
 
 app.include_router(git_summary_handler.router, prefix="/api")
-
-@app.get("/analyze")
-async def analyze_code():
-    return {"status": "Analysis Started"}
+# Analysis jobs: POST /analyze to submit, then poll GET /analyze/{job_id}; GET /analyze/{job_id}/report
+# streams the report as it is written; GET /archive streams a zip
+app.include_router(routes.router)
 
 # Run with: uvicorn main:app --reload
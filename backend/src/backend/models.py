@@ -1,8 +1,8 @@
 # File for SQLAlchemy models
 
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, JSON, Index
 from sqlalchemy.sql import func
-from database import Base
+from backend.database import Base
 
 class CodeAnalysisResult(Base):
     __tablename__ = "code_analysis_results"
@@ -12,3 +12,37 @@ class CodeAnalysisResult(Base):
     complexity_score = Column(Integer)
     analysis_report = Column(Text)
     created_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class AnalysisJob(Base):
+    __tablename__ = "analysis_jobs"
+
+    id = Column(String(36), primary_key=True)
+    # queued -> running -> succeeded | failed | cancelled
+    status = Column(String, nullable=False, default="queued", index=True)
+    repo_path = Column(String, nullable=False)
+    progress = Column(Integer, nullable=False, default=0)  # Percent of detectors done
+    stage = Column(String)  # Last detector that finished
+    result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
+
+
+class AnalysisResult(Base):
+    """Cached analyze_folder output for one commit, selection and engine version."""
+    __tablename__ = "analysis_results"
+    __table_args__ = (
+        Index("ix_analysis_results_key", "repo_url", "commit_sha", "selection_hash",
+              "engine_version", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    repo_url = Column(String, nullable=False)
+    commit_sha = Column(String(64), nullable=False)
+    selection_hash = Column(String(64), nullable=False)  # sha256 of selected_subdirs
+    selected_subdirs = Column(JSON, nullable=False)  # Sorted; empty means whole repository
+    engine_version = Column(String, nullable=False)
+    result = Column(JSON, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The engines import each other as top-level modules so they also run as scripts
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
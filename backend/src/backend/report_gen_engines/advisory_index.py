@@ -0,0 +1,232 @@
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import threading
+import zipfile
+from bisect import bisect_right
+
+
+# Local OSV dump: a directory of advisory JSON files, or zip archives of them (as published by OSV)
+OSV_DATABASE_PATH = os.getenv("OSV_DATABASE_PATH", "")
+# Index built from the dump, rebuilt whenever the dump is newer
+OSV_INDEX_PATH = os.path.abspath(os.getenv("OSV_INDEX_PATH", "./analysis_cache/osv_index.bin"))
+
+INDEX_MAGIC = b"OSVIDX1\n"
+INDEX_HEADER = struct.Struct("<Q")  # Number of packages
+# Package key offset and length, package data offset and length
+INDEX_ENTRY = struct.Struct("<QIQI")
+# Decoded packages kept in memory per index
+PACKAGE_CACHE_SIZE = 4096
+
+
+def normalize_package_name(ecosystem, name):
+    """Name as used for lookups: PyPI names are case and separator insensitive, like pip."""
+    if ecosystem == "PyPI":
+        return re.sub(r"[-_.]+", "-", name).lower()
+    if ecosystem in ("npm", "Packagist"):
+        return name.lower()
+    return name
+
+
+def version_key(version):
+    """Sort key of a version string, close enough for semver, PEP 440 and Maven versions.
+
+    Numbers compare numerically and pre-release tags (alpha, rc, ...) sort before the release.
+    """
+    key = []
+    for part in re.findall(r"\d+|[A-Za-z]+", version.lstrip("vV")):
+        key.append((1, int(part), "") if part.isdigit() else (-1, 0, part.lower()))
+    key.append((0, 0, ""))  # The release itself, after its pre-releases and before any x.y.z.1
+    return tuple(key)
+
+
+def _iter_osv_records(dump_path):
+    """Yield every advisory of an OSV dump directory or zip archive."""
+    if zipfile.is_zipfile(dump_path):
+        archives = [dump_path]
+    else:
+        archives = []
+        for root, _, files in os.walk(dump_path):
+            for file in files:
+                file_path = os.path.join(root, file)
+                if file.endswith(".zip"):
+                    archives.append(file_path)
+                elif file.endswith(".json"):
+                    try:
+                        with open(file_path, "r", encoding="utf-8") as f:
+                            yield json.load(f)
+                    except (OSError, json.JSONDecodeError):
+                        logging.warning(f"Skipping unreadable advisory {file_path}")
+    for archive in archives:
+        with zipfile.ZipFile(archive) as zf:
+            for name in zf.namelist():
+                if name.endswith(".json"):
+                    try:
+                        yield json.loads(zf.read(name))
+                    except json.JSONDecodeError:
+                        logging.warning(f"Skipping unreadable advisory {archive}:{name}")
+
+
+def _dump_mtime(dump_path):
+    if os.path.isfile(dump_path):
+        return os.path.getmtime(dump_path)
+    return max((os.path.getmtime(os.path.join(root, file))
+                for root, _, files in os.walk(dump_path) for file in files), default=0)
+
+
+def build_advisory_index(dump_path, index_path=OSV_INDEX_PATH):
+    """Pre-index an OSV dump into a file sorted by package, searchable without loading it."""
+    packages = {}
+    for record in _iter_osv_records(dump_path):
+        advisory_id = record.get("id")
+        if not advisory_id or record.get("withdrawn"):
+            continue
+        for affected in record.get("affected", []):
+            package = affected.get("package") or {}
+            # "Debian:11" and the like: the release does not matter for lookups
+            ecosystem = package.get("ecosystem", "").split(":")[0]
+            if not ecosystem or not package.get("name"):
+                continue
+            key = f"{ecosystem}\x00{normalize_package_name(ecosystem, package['name'])}"
+            entry = packages.setdefault(key, {"ranges": [], "versions": {}, "summaries": {}})
+            entry["summaries"][advisory_id] = record.get("summary") or record.get("details", "")[:200]
+            for version in affected.get("versions", []):
+                entry["versions"].setdefault(version, []).append(advisory_id)
+            for version_range in affected.get("ranges", []):
+                if version_range.get("type") == "GIT":
+                    continue  # Commit ranges cannot be matched against package versions
+                introduced = None
+                for event in version_range.get("events", []):
+                    if "introduced" in event:
+                        introduced = event["introduced"]
+                    elif "fixed" in event or "last_affected" in event:
+                        entry["ranges"].append(
+                            [introduced or "0", event.get("fixed"), event.get("last_affected"), advisory_id])
+                        introduced = None
+                if introduced is not None:
+                    entry["ranges"].append([introduced, None, None, advisory_id])
+
+    keys = sorted(key.encode("utf-8") for key in packages)
+    blobs = []
+    for key in keys:
+        entry = packages[key.decode("utf-8")]
+        entry["ranges"].sort(key=lambda version_range: version_key(version_range[0]))
+        blobs.append(json.dumps(entry, separators=(",", ":")).encode("utf-8"))
+
+    index_dir = os.path.dirname(os.path.abspath(index_path))
+    os.makedirs(index_dir, exist_ok=True)
+    keys_offset = len(INDEX_MAGIC) + INDEX_HEADER.size + INDEX_ENTRY.size * len(keys)
+    data_offset = keys_offset + sum(len(key) for key in keys)
+    # A unique temporary file, so concurrent builds never write into each other's output
+    fd, temp_path = tempfile.mkstemp(dir=index_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(INDEX_MAGIC)
+            f.write(INDEX_HEADER.pack(len(keys)))
+            for key, blob in zip(keys, blobs):
+                f.write(INDEX_ENTRY.pack(keys_offset, len(key), data_offset, len(blob)))
+                keys_offset += len(key)
+                data_offset += len(blob)
+            for key in keys:
+                f.write(key)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(temp_path, index_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    logging.info(f"Indexed advisories of {len(keys)} packages into {index_path}")
+    return index_path
+
+
+class AdvisoryIndex:
+    """Read-only, memory-mapped view of an index built by build_advisory_index."""
+
+    def __init__(self, index_path):
+        self._file = open(index_path, "rb")
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            raise ValueError(f"Not an advisory index: {index_path}")
+        (self.package_count,) = INDEX_HEADER.unpack_from(self._data, len(INDEX_MAGIC))
+        self._entries_offset = len(INDEX_MAGIC) + INDEX_HEADER.size
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, position):
+        return INDEX_ENTRY.unpack_from(self._data, self._entries_offset + position * INDEX_ENTRY.size)
+
+    def _package(self, key):
+        """Decoded advisory data of a package key, found by binary search over the sorted keys."""
+        low, high = 0, self.package_count
+        while low < high:
+            middle = (low + high) // 2
+            key_offset, key_length, data_offset, data_length = self._entry(middle)
+            current = self._data[key_offset:key_offset + key_length]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                entry = json.loads(self._data[data_offset:data_offset + data_length])
+                entry["introduced_keys"] = [version_key(version_range[0]) for version_range in entry["ranges"]]
+                return entry
+        return None
+
+    def lookup(self, ecosystem, name, version):
+        """Advisories affecting one package version, as [{"id", "summary"}]."""
+        key = f"{ecosystem}\x00{normalize_package_name(ecosystem, name)}".encode("utf-8")
+        with self._lock:
+            if key not in self._cache:
+                if len(self._cache) >= PACKAGE_CACHE_SIZE:
+                    self._cache.clear()
+                self._cache[key] = self._package(key)
+            entry = self._cache[key]
+        if entry is None:
+            return []
+
+        affected = set(entry["versions"].get(version, []))
+        current = version_key(version)
+        # Only ranges introduced at or before this version can contain it
+        for introduced, fixed, last_affected, advisory_id in entry["ranges"][:bisect_right(
+                entry["introduced_keys"], current)]:
+            if fixed is not None and current >= version_key(fixed):
+                continue
+            if last_affected is not None and current > version_key(last_affected):
+                continue
+            affected.add(advisory_id)
+        return [{"id": advisory_id, "summary": entry["summaries"].get(advisory_id, "")}
+                for advisory_id in sorted(affected)]
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+
+_advisory_index = None
+_advisory_index_guard = threading.Lock()
+
+
+def get_advisory_index():
+    """The index of the configured OSV dump, (re)built when needed, or None without a dump."""
+    global _advisory_index
+    if not OSV_DATABASE_PATH or not os.path.exists(OSV_DATABASE_PATH):
+        return None
+    with _advisory_index_guard:
+        if _advisory_index is None:
+            if (not os.path.isfile(OSV_INDEX_PATH)
+                    or os.path.getmtime(OSV_INDEX_PATH) < _dump_mtime(OSV_DATABASE_PATH)):
+                build_advisory_index(OSV_DATABASE_PATH, OSV_INDEX_PATH)
+            _advisory_index = AdvisoryIndex(OSV_INDEX_PATH)
+        return _advisory_index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python advisory_index.py <osv dump directory or zip> [index path]")
+        sys.exit(1)
+    build_advisory_index(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else OSV_INDEX_PATH)
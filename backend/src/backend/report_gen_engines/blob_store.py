@@ -0,0 +1,103 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from sqlite_lru import SQLiteLRUStore
+
+
+# Per-blob analyzer results, shared by every analysis on this machine
+BLOB_STORE_PATH = os.path.abspath(os.getenv("BLOB_STORE_PATH", "./analysis_cache/blob_results.sqlite3"))
+# Size cap of the stored results; 0 disables the store
+BLOB_STORE_MAX_BYTES = int(os.getenv("BLOB_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Blob IDs per SQL statement (SQLite limits the number of bound parameters)
+QUERY_CHUNK_SIZE = 500
+
+
+class BlobStore(SQLiteLRUStore):
+    """On-disk store of analyzer results keyed by (blob SHA, analyzer name, analyzer version).
+
+    Results only depend on file contents, so they carry over between commits,
+    branches, forks and runs. Least recently used entries are evicted once the
+    stored results exceed max_bytes.
+    """
+
+    table = "blob_results"
+    columns = ("blob_id TEXT NOT NULL", "analyzer TEXT NOT NULL", "version TEXT NOT NULL", "result TEXT NOT NULL")
+    primary_key = ("blob_id", "analyzer", "version")
+    label = "Blob store"
+
+    def __init__(self, path=BLOB_STORE_PATH, max_bytes=BLOB_STORE_MAX_BYTES):
+        super().__init__(path, max_bytes)
+
+    def get_many(self, analyzer, version, blob_ids):
+        """Stored results of the given blobs, as {blob ID: result}; missing blobs are left out."""
+        blob_ids = list(dict.fromkeys(blob_ids))
+        if not self.enabled or not blob_ids:
+            return {}
+        found = {}
+        try:
+            with self._lock:
+                connection = self._connect()
+                for i in range(0, len(blob_ids), QUERY_CHUNK_SIZE):
+                    chunk = blob_ids[i:i + QUERY_CHUNK_SIZE]
+                    rows = connection.execute(
+                        f"SELECT blob_id, result FROM blob_results WHERE analyzer = ? AND version = ? "
+                        f"AND blob_id IN ({', '.join('?' * len(chunk))})",
+                        [analyzer, str(version), *chunk]).fetchall()
+                    found.update((blob_id, json.loads(result)) for blob_id, result in rows)
+                now = time.time()
+                connection.executemany(
+                    "UPDATE blob_results SET last_used = ? WHERE blob_id = ? AND analyzer = ? AND version = ?",
+                    [(now, blob_id, analyzer, str(version)) for blob_id in found])
+                connection.commit()
+                self.hits += len(found)
+                self.misses += len(blob_ids) - len(found)
+        except sqlite3.Error as e:
+            logging.warning(f"Blob store lookup failed: {e}")
+            return {}
+        return found
+
+    def put_many(self, analyzer, version, results):
+        """Store {blob ID: JSON-serializable result} and evict old entries beyond the size cap."""
+        if not self.enabled or not results:
+            return
+        now = time.time()
+        rows = []
+        for blob_id, result in results.items():
+            payload = json.dumps(result)
+            rows.append((blob_id, analyzer, str(version), payload, len(payload), now))
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.executemany(
+                    "INSERT OR REPLACE INTO blob_results "
+                    "(blob_id, analyzer, version, result, size, last_used) VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._evict(connection)
+                connection.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Blob store update failed: {e}")
+
+
+def get_blob_store():
+    """The store shared by every detector in this process."""
+    return BlobStore.shared()
+
+
+def lookup_or_compute(analyzer, version, rel_paths, blob_ids, compute):
+    """Per-file results of an analyzer, computing (and storing) only those not in the store.
+
+    blob_ids maps paths to blob OIDs; files without one are always computed.
+    compute(rel_paths) must return {path: JSON-serializable result} for the files it is given.
+    """
+    store = get_blob_store()
+    cached = store.get_many(analyzer, version, [blob_ids[path] for path in rel_paths if path in blob_ids])
+    results = {path: cached[blob_ids[path]] for path in rel_paths if blob_ids.get(path) in cached}
+
+    computed = compute([path for path in rel_paths if path not in results])
+    store.put_many(analyzer, version, {
+        blob_ids[path]: result for path, result in computed.items() if path in blob_ids})
+    results.update(computed)
+    logging.info(f"Blob store {analyzer}: {len(cached)} reused, {len(computed)} computed")
+    return results
@@ -0,0 +1,239 @@
+import json
+import logging
+import os
+import time
+from collections import Counter
+
+from file_index import FileEntry
+from git_scrap_data_basic import format_size, get_current_ref, run_git_command
+from language_engine import IGNORED_DIRS, IGNORED_FILES, LANGUAGE_EXTENSIONS, detect_frameworks
+from tree_reader import GitObjectReader, TreeIndex, resolve_commit
+
+
+# Entry modes of raw git tree objects
+TREE_MODE = b"40000"
+SUBMODULE_MODE = b"160000"
+SYMLINK_MODE = b"120000"
+
+
+def _parse_tree(data, oid_size):
+    """Split a raw tree object into (mode, name, OID) entries."""
+    entries = []
+    position = 0
+    while position < len(data):
+        space = data.index(b" ", position)
+        nul = data.index(b"\x00", space)
+        oid_end = nul + 1 + oid_size
+        entries.append((data[position:space], data[space + 1:nul].decode("utf-8", errors="ignore"),
+                        data[nul + 1:oid_end].hex()))
+        position = oid_end
+    return entries
+
+
+class TreeMemo:
+    """Per-tree summaries keyed by tree OID, so a subtree shared by several
+    branches is read and counted only once."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.reader = GitObjectReader(directory)
+        self.size_reader = GitObjectReader(directory, batch_check=True)
+        self.trees = {}  # Tree OID -> entries
+        self.summaries = {}  # Tree OID -> summary
+        self.blob_sizes = {}  # Blob OID -> size in bytes
+        self.tree_lookups = 0
+
+    def entries(self, tree_id):
+        if tree_id not in self.trees:
+            self.trees[tree_id] = _parse_tree(self.reader.read(tree_id) or b"", len(tree_id) // 2)
+        return self.trees[tree_id]
+
+    def blob_size(self, blob_id):
+        if blob_id not in self.blob_sizes:
+            info = self.size_reader.info(blob_id)
+            self.blob_sizes[blob_id] = info[1] if info else 0
+        return self.blob_sizes[blob_id]
+
+    def summarize(self, tree_id):
+        """File, folder, size and language counts of a tree, with the rules of get_language_usage."""
+        self.tree_lookups += 1
+        if tree_id in self.summaries:
+            return self.summaries[tree_id]
+
+        summary = {"total_files": 0, "total_folders": 0, "file_count": 0, "size_bytes": 0,
+                   "language_files": Counter()}
+        for mode, name, oid in self.entries(tree_id):
+            if mode == TREE_MODE:
+                summary["total_folders"] += 1
+                subtree = self.summarize(oid)
+                summary["file_count"] += subtree["file_count"]
+                summary["size_bytes"] += subtree["size_bytes"]
+                # Like get_language_usage, ignored directories are counted but not entered
+                if not any(ignored in name for ignored in IGNORED_DIRS):
+                    summary["total_folders"] += subtree["total_folders"]
+                    summary["total_files"] += subtree["total_files"]
+                    summary["language_files"] += subtree["language_files"]
+            elif mode == SUBMODULE_MODE:
+                summary["total_folders"] += 1
+            else:
+                summary["file_count"] += 1
+                summary["size_bytes"] += self.blob_size(oid)
+                ext = name.split(".")[-1]
+                if name not in IGNORED_FILES and ext in LANGUAGE_EXTENSIONS:
+                    summary["language_files"][LANGUAGE_EXTENSIONS[ext]] += 1
+                    summary["total_files"] += 1
+
+        self.summaries[tree_id] = summary
+        return summary
+
+    def root_index(self, commit, tree_id):
+        """TreeIndex of the top level (and bin/) of a tree: everything detect_frameworks reads."""
+        index = TreeIndex(self.directory, commit, self.reader)
+        pending = [("", tree_id)]
+        while pending:
+            rel_dir, current_tree = pending.pop()
+            dirs, files = [], []
+            for mode, name, oid in self.entries(current_tree):
+                rel_path = f"{rel_dir}/{name}" if rel_dir else name
+                if mode in (TREE_MODE, SUBMODULE_MODE):
+                    dirs.append(name)
+                    if mode == TREE_MODE and rel_path == "bin":
+                        pending.append((rel_path, oid))
+                    continue
+                files.append(name)
+                index.files[rel_path] = FileEntry(rel_path, 0, os.path.splitext(name)[1], rel_dir)
+                if mode != SYMLINK_MODE:
+                    index.blob_ids[rel_path] = oid
+            index.directories[rel_dir] = (dirs, files)
+        return index
+
+    def close(self):
+        self.reader.close()
+        self.size_reader.close()
+
+
+def list_branches(directory):
+    """Map branch names to their refs: local branches, then remote ones not also local."""
+    output = run_git_command(directory, [
+        "git", "for-each-ref", "--format=%(refname)%09%(symref)", "refs/heads", "refs/remotes"])
+    branches = {}
+    for line in (output or "").split("\n"):
+        refname, _, symref = line.partition("\t")
+        if not refname or symref:
+            continue  # Skip symbolic refs such as origin/HEAD
+        if refname.startswith("refs/heads/"):
+            branches[refname[len("refs/heads/"):]] = refname
+        else:
+            name = refname.split("/", 3)[-1]
+            branches.setdefault(name, refname)
+    return branches
+
+
+def _language_percentages(summary):
+    total_files = summary["total_files"]
+    if not total_files:
+        return {}
+    return {lang: round((count / total_files) * 100, 2)
+            for lang, count in summary["language_files"].items()}
+
+
+def _compare_with_default(branch, default):
+    """How a branch differs from the default branch."""
+    languages = set(branch["language_percentages"]) | set(default["language_percentages"])
+    language_change = {
+        lang: round(branch["language_percentages"].get(lang, 0)
+                    - default["language_percentages"].get(lang, 0), 2)
+        for lang in sorted(languages)
+    }
+    return {
+        "total_files": branch["total_files"] - default["total_files"],
+        "total_folders": branch["total_folders"] - default["total_folders"],
+        "file_count": branch["file_count"] - default["file_count"],
+        "size_bytes": branch["size_bytes"] - default["size_bytes"],
+        # Change in percentage points
+        "language_usage": {lang: change for lang, change in language_change.items() if change},
+        "frameworks_added": sorted(set(branch["frameworks"]) - set(default["frameworks"])),
+        "frameworks_removed": sorted(set(default["frameworks"]) - set(branch["frameworks"])),
+    }
+
+
+def compare_branches(directory, branches=None, default_branch=None, on_branch_complete=None):
+    """Analyze several branches (all by default) and report how each differs from the default branch.
+
+    Trees are read from the object database and summarized once per tree OID,
+    so branches sharing most of their trees cost little more than one branch.
+    on_branch_complete(name, result, completed, total) is called after each branch.
+    """
+    available = list_branches(directory)
+    if default_branch is None:
+        current_ref = get_current_ref(directory)
+        default_branch = current_ref.split("/", 2)[-1] if current_ref else None
+    selected = list(dict.fromkeys(branches or available))
+    if default_branch is None and selected:
+        default_branch = selected[0]
+    if default_branch is not None:
+        selected = [default_branch] + [name for name in selected if name != default_branch]
+
+    memo = TreeMemo(directory)
+    frameworks_by_tree = {}
+    report = {}
+    try:
+        for completed, name in enumerate(selected, start=1):
+            commit = resolve_commit(directory, available.get(name, name))
+            commit_object = memo.reader.read(commit) if commit else None
+            if not commit_object:
+                report[name] = {"error": f"Unknown branch: {name}"}
+            else:
+                # A commit object starts with "tree <OID>"
+                tree_id = commit_object.split(b"\n", 1)[0].split()[1].decode("ascii")
+                summary = memo.summarize(tree_id)
+                if tree_id not in frameworks_by_tree:
+                    frameworks_by_tree[tree_id] = sorted(
+                        detect_frameworks(directory, memo.root_index(commit, tree_id)))
+                report[name] = {
+                    "commit": commit,
+                    "total_files": summary["total_files"],
+                    "total_folders": summary["total_folders"],
+                    "file_count": summary["file_count"],
+                    "size_bytes": summary["size_bytes"],
+                    "total_size": format_size(summary["size_bytes"]),
+                    "language_percentages": _language_percentages(summary),
+                    "frameworks": frameworks_by_tree[tree_id],
+                }
+            if on_branch_complete:
+                on_branch_complete(name, report[name], completed, len(selected))
+        memo_stats = {"unique_trees": len(memo.summaries), "tree_lookups": memo.tree_lookups}
+    finally:
+        memo.close()
+
+    default = report.get(default_branch)
+    differences = {}
+    if default and "error" not in default:
+        differences = {
+            name: _compare_with_default(branch, default)
+            for name, branch in report.items() if name != default_branch and "error" not in branch
+        }
+    for branch in report.values():
+        if "language_percentages" in branch:
+            branch["language_usage"] = {
+                lang: f"{percentage} %" for lang, percentage in branch.pop("language_percentages").items()}
+
+    return {
+        "default_branch": default_branch,
+        "branches": report,
+        "differences_from_default": differences,
+        # Trees summarized vs. trees visited across all branches
+        "tree_memoization": memo_stats,
+    }
+
+
+if __name__ == "__main__":
+    folder_path = input("Enter the repository path to compare branches in: ").strip()
+
+    if os.path.isdir(folder_path):
+        start_time = time.time()
+        comparison = compare_branches(folder_path)
+        logging.info(f"Branch comparison completed in {time.time() - start_time:.2f} seconds")
+        print(json.dumps(comparison, indent=4, ensure_ascii=False))
+    else:
+        logging.error("Invalid directory path. Please enter a valid folder path.")
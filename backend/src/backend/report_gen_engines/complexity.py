@@ -0,0 +1,189 @@
+import ast
+import os
+import re
+from functools import partial
+
+from process_pool import iter_batch_results
+from tree_reader import iter_file_contents
+
+
+# Bump when the computed complexities change; stored per-file results are keyed on it
+ENGINE_VERSION = 1
+
+# Source files the engine understands: Python through ast, the rest through the tokenizer
+COMPLEXITY_EXTENSIONS = {
+    "py", "js", "ts", "java", "cpp", "c", "cs", "rb", "php", "go", "rs", "swift", "kt", "dart", "sh",
+}
+# Languages whose comments start with "#" ("//" and "/* */" otherwise; PHP has both)
+HASH_COMMENT_EXTENSIONS = {"rb", "sh", "php"}
+
+# Dependencies, build output and VCS data are not the project's own code
+COMPLEXITY_IGNORED_DIRS = {"node_modules", "venv", ".venv", "dist", "build", "vendor", ".git", "__pycache__"}
+
+# Functions kept per file, and hotspots listed per repository
+TOP_FUNCTIONS = 10
+
+# Bytes sniffed to tell binary files apart
+BINARY_SNIFF_BYTES = 8000
+
+# Keywords that open a branch of control flow
+DECISION_KEYWORDS = {
+    "if", "elif", "elsif", "for", "foreach", "while", "until", "case", "catch", "except",
+    "rescue", "unless", "when", "guard",
+}
+# Words that precede "(" without naming a function
+NON_FUNCTION_WORDS = DECISION_KEYWORDS | {
+    "switch", "return", "sizeof", "synchronized", "using", "lock", "fixed", "function", "func", "fn",
+    "fun", "new", "typeof", "await", "match", "with", "do", "throw", "yield", "assert", "defined",
+}
+
+_C_NOISE = r'//[^\n]*|/\*.*?\*/|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|`(?:\\.|[^`\\])*`'
+_HASH_NOISE = r'#[^\n]*|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\''
+# Comments and string literals, which must not be mistaken for code
+NOISE_PATTERNS = {
+    "c": re.compile(_C_NOISE, re.S),
+    "hash": re.compile(_HASH_NOISE, re.S),
+    "php": re.compile(f"{_C_NOISE}|{_HASH_NOISE}", re.S),
+}
+TOKEN_PATTERN = re.compile(r"[A-Za-z_$][\w$]*|&&|\|\||\?(?=\s)|[{}();\n]")
+
+
+def _python_decisions(node):
+    if isinstance(node, (ast.If, ast.For, ast.AsyncFor, ast.While, ast.IfExp, ast.ExceptHandler,
+                         ast.match_case)):
+        return 1
+    if isinstance(node, ast.BoolOp):
+        return len(node.values) - 1
+    if isinstance(node, ast.comprehension):
+        return 1 + len(node.ifs)
+    return 0
+
+
+def python_complexity(source):
+    """(module-level decisions, [[function, line, complexity], ...]) of Python source, via ast."""
+    functions = []
+
+    def visit(node, scope):
+        # Decision points of this block, not counting nested functions
+        decisions = 0
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                name = f"{scope}.{child.name}" if scope else child.name
+                functions.append([name, child.lineno, 1 + visit(child, name)])
+            elif isinstance(child, ast.ClassDef):
+                decisions += visit(child, f"{scope}.{child.name}" if scope else child.name)
+            else:
+                decisions += _python_decisions(child) + visit(child, scope)
+        return decisions
+
+    return visit(ast.parse(source), ""), functions
+
+
+def token_complexity(source, extension):
+    """Approximate (file-level decisions, functions) for brace languages from a token stream.
+
+    A function is a name followed by a parameter list and a "{" block; decision
+    keywords, "&&", "||" and the ternary "?" count towards the innermost one.
+    """
+    noise = NOISE_PATTERNS["php" if extension == "php" else
+                           "hash" if extension in HASH_COMMENT_EXTENSIONS else "c"]
+    source = noise.sub(lambda match: "\n" * match.group().count("\n"), source)
+
+    functions, blocks = [], []  # blocks: open "{" blocks, a [name, line, complexity] for functions
+    file_decisions = 0
+    line, paren_depth = 1, 0
+    previous_word, candidate, header = None, None, None
+    for match in TOKEN_PATTERN.finditer(source):
+        token = match.group()
+        word = None
+        if token == "\n":
+            line += 1
+            continue
+        if token == "(":
+            if paren_depth == 0 and previous_word and previous_word not in NON_FUNCTION_WORDS:
+                candidate, header = (previous_word, line), None
+            paren_depth += 1
+        elif token == ")":
+            paren_depth = max(0, paren_depth - 1)
+            if paren_depth == 0 and candidate:
+                header, candidate = candidate, None
+        elif token == "{":
+            blocks.append([header[0], header[1], 1] if header and paren_depth == 0 else None)
+            header = candidate = None
+        elif token == "}":
+            if blocks:
+                block = blocks.pop()
+                if block:
+                    functions.append(block)
+        elif token == ";":
+            if paren_depth == 0:
+                header = candidate = None
+        else:
+            if token in DECISION_KEYWORDS or token in ("&&", "||", "?"):
+                function = next((block for block in reversed(blocks) if block), None)
+                if function:
+                    function[2] += 1
+                else:
+                    file_decisions += 1
+                if token in DECISION_KEYWORDS:
+                    header = None
+            if token[0].isalpha() or token[0] in "_$":
+                word = token
+        previous_word = word
+
+    functions.extend(block for block in blocks if block)  # Unbalanced braces at the end
+    return file_decisions, functions
+
+
+def file_complexity(data, extension):
+    """Complexity of one file's contents, or None for binaries and unsupported languages."""
+    if extension not in COMPLEXITY_EXTENSIONS or not data or b"\x00" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    source = data.decode("utf-8", errors="ignore")
+    try:
+        if extension == "py":
+            file_decisions, functions = python_complexity(source)
+        else:
+            file_decisions, functions = token_complexity(source, extension)
+    except (SyntaxError, ValueError, RecursionError):
+        # Python 2 or otherwise unparsable: fall back to the approximation
+        file_decisions, functions = token_complexity(source, extension)
+
+    functions.sort(key=lambda function: function[2], reverse=True)
+    function_total = sum(function[2] for function in functions)
+    return {
+        "complexity": file_decisions + function_total,
+        "function_count": len(functions),
+        "function_total": function_total,
+        "functions": functions[:TOP_FUNCTIONS],
+    }
+
+
+def select_complexity_candidates(file_index, size_limit_bytes):
+    """Pick the source files under the size cap outside dependency and build directories."""
+    return [
+        entry.path for entry in file_index.files.values()
+        if entry.extension[1:] in COMPLEXITY_EXTENSIONS and 0 < entry.size <= size_limit_bytes
+        and not any(part in COMPLEXITY_IGNORED_DIRS for part in entry.parent.split("/"))
+    ]
+
+
+def _analyze_batch(root, items, from_git):
+    """Complexity of (path, blob OID or None) items, read from git or from the checkout."""
+    return {rel_path: file_complexity(data, os.path.splitext(rel_path)[1][1:])
+            for rel_path, data in iter_file_contents(root, items, from_git)}
+
+
+def analyze_complexity(root, rel_paths, max_workers=None, blob_ids=None, deadline=None):
+    """Complexity per file, fanning out across the shared process pool for large trees.
+
+    max_workers=1 parses in this process instead. With blob_ids, files are read from the object database of the repository
+    at root. Batches not started by deadline (a time.monotonic() value) are
+    skipped, so the result may cover only part of rel_paths.
+    """
+    items = [(rel_path, blob_ids.get(rel_path) if blob_ids is not None else None) for rel_path in rel_paths]
+    results = {}
+    for batch_results in iter_batch_results(partial(_analyze_batch, root, from_git=blob_ids is not None),
+                                            items, max_workers, deadline):
+        results.update(batch_results)
+    return results
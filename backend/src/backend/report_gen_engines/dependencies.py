@@ -0,0 +1,245 @@
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+try:
+    import tomllib  # Python 3.11+
+except ImportError:
+    tomllib = None
+
+from advisory_index import normalize_package_name
+
+
+# Bump when the dependency graph or advisory matching changes
+ENGINE_VERSION = 1
+
+# Manifests (declaring direct dependencies) and lockfiles (pinning the whole graph)
+MANIFEST_FILES = {
+    "requirements.txt", "package.json", "package-lock.json", "pyproject.toml", "poetry.lock",
+    "composer.json", "composer.lock", "pom.xml",
+}
+# Installed or vendored dependencies carry manifests of their own
+DEPENDENCY_IGNORED_DIRS = {"node_modules", "vendor", "venv", ".venv", ".git", "site-packages", "target"}
+
+# Most depended-upon packages listed in the report
+TOP_DEPENDED_UPON = 10
+
+REQUIREMENT_PATTERN = re.compile(
+    r"^([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(?:===?\s*([A-Za-z0-9._+!-]+))?")
+# An exact version, as opposed to a range such as "^1.2" or ">=2"
+EXACT_VERSION_PATTERN = re.compile(r"^v?\d+(\.\d+)*([.-]?[A-Za-z0-9.]+)?$")
+# Composer platform requirements are not packages
+COMPOSER_PLATFORM_PATTERN = re.compile(r"^(php|hhvm|composer(-plugin)?-api|ext-.+|lib-.+)$", re.I)
+MAVEN_NAMESPACE = "{http://maven.apache.org/POM/4.0.0}"
+
+
+def _exact_version(spec):
+    """The version a specifier pins, or None for ranges, tags and URLs."""
+    spec = (spec or "").strip().lstrip("=")
+    return spec.lstrip("v") if EXACT_VERSION_PATTERN.match(spec) else None
+
+
+def parse_requirements(text):
+    """{name: version or None} of a requirements.txt; only "==" pins carry a version."""
+    direct = {}
+    for line in text.splitlines():
+        line = line.split(" #", 1)[0].strip()
+        if not line or line.startswith(("#", "-")):
+            continue  # Comments and pip options (-r, -e, --index-url, ...)
+        match = REQUIREMENT_PATTERN.match(line)
+        if match:
+            direct[match.group(1)] = match.group(2)
+    return direct
+
+
+def parse_package_json(text):
+    data = json.loads(text)
+    direct = {}
+    for key in ("dependencies", "devDependencies", "optionalDependencies"):
+        for name, spec in (data.get(key) or {}).items():
+            direct[name] = _exact_version(spec) if isinstance(spec, str) else None
+    return direct
+
+
+def parse_package_lock(text):
+    """{name: [(version, [dependency names])]} of a package-lock.json, any lockfile version."""
+    data = json.loads(text)
+    packages = {}
+    if "packages" in data:
+        # Lockfile v2/v3: flat map of install paths
+        for path, info in data["packages"].items():
+            if not path or info.get("link"):
+                continue  # The project itself and workspace links
+            name = info.get("name") or path.rsplit("node_modules/", 1)[-1]
+            requires = list(info.get("dependencies") or {}) + list(info.get("optionalDependencies") or {})
+            packages.setdefault(name, []).append((info.get("version"), requires))
+        return packages
+
+    # Lockfile v1: nested dependency trees
+    pending = list((data.get("dependencies") or {}).items())
+    while pending:
+        name, info = pending.pop()
+        packages.setdefault(name, []).append((info.get("version"), list(info.get("requires") or {})))
+        pending.extend((info.get("dependencies") or {}).items())
+    return packages
+
+
+def parse_pyproject(text):
+    """Direct dependencies of a pyproject.toml, from Poetry tables or PEP 621."""
+    data = tomllib.loads(text)
+    direct = {}
+    for requirement in (data.get("project") or {}).get("dependencies") or []:
+        direct.update(parse_requirements(requirement))
+    poetry = (data.get("tool") or {}).get("poetry") or {}
+    tables = [poetry.get("dependencies") or {}, poetry.get("dev-dependencies") or {}]
+    tables.extend((group.get("dependencies") or {}) for group in (poetry.get("group") or {}).values())
+    for table in tables:
+        for name, spec in table.items():
+            if name.lower() != "python":
+                direct[name] = _exact_version(spec) if isinstance(spec, str) else None
+    return direct
+
+
+def parse_poetry_lock(text):
+    data = tomllib.loads(text)
+    return {
+        package["name"]: [(package.get("version"), list(package.get("dependencies") or {}))]
+        for package in data.get("package", []) if "name" in package
+    }
+
+
+def parse_composer_json(text):
+    data = json.loads(text)
+    direct = {}
+    for key in ("require", "require-dev"):
+        for name, spec in (data.get(key) or {}).items():
+            if not COMPOSER_PLATFORM_PATTERN.match(name):
+                direct[name] = _exact_version(spec) if isinstance(spec, str) else None
+    return direct
+
+
+def parse_composer_lock(text):
+    data = json.loads(text)
+    packages = {}
+    for package in (data.get("packages") or []) + (data.get("packages-dev") or []):
+        requires = [name for name in (package.get("require") or {})
+                    if not COMPOSER_PLATFORM_PATTERN.match(name)]
+        packages[package["name"]] = [((package.get("version") or "").lstrip("v") or None, requires)]
+    return packages
+
+
+def parse_pom(data):
+    """Direct dependencies of a pom.xml as "groupId:artifactId", resolving ${property} versions."""
+    root = ET.fromstring(data)
+    namespace = MAVEN_NAMESPACE if root.tag.startswith(MAVEN_NAMESPACE) else ""
+    properties = {}
+    for element in root.findall(f"{namespace}properties/*"):
+        properties[element.tag[len(namespace):]] = (element.text or "").strip()
+    project_version = root.findtext(f"{namespace}version") or root.findtext(f"{namespace}parent/{namespace}version")
+    if project_version:
+        properties.setdefault("project.version", project_version.strip())
+
+    direct = {}
+    for dependency in root.findall(f"{namespace}dependencies/{namespace}dependency"):
+        group_id = (dependency.findtext(f"{namespace}groupId") or "").strip()
+        artifact_id = (dependency.findtext(f"{namespace}artifactId") or "").strip()
+        if not group_id or not artifact_id:
+            continue
+        version = (dependency.findtext(f"{namespace}version") or "").strip()
+        version = re.sub(r"\$\{([^}]+)\}", lambda match: properties.get(match.group(1), match.group()), version)
+        direct[f"{group_id}:{artifact_id}"] = _exact_version(version)
+    return direct
+
+
+# File name -> (ecosystem, parser, whether it lists resolved packages rather than direct ones)
+PARSERS = {
+    "requirements.txt": ("PyPI", parse_requirements, False),
+    "pyproject.toml": ("PyPI", parse_pyproject, False),
+    "poetry.lock": ("PyPI", parse_poetry_lock, True),
+    "package.json": ("npm", parse_package_json, False),
+    "package-lock.json": ("npm", parse_package_lock, True),
+    "composer.json": ("Packagist", parse_composer_json, False),
+    "composer.lock": ("Packagist", parse_composer_lock, True),
+    "pom.xml": ("Maven", parse_pom, False),
+}
+
+
+def find_manifests(file_index):
+    """Paths of the dependency manifests and lockfiles of a project, outside installed dependencies."""
+    return sorted(
+        entry.path for entry in file_index.files.values()
+        if os.path.basename(entry.path) in MANIFEST_FILES
+        and not any(part in DEPENDENCY_IGNORED_DIRS for part in entry.parent.split("/"))
+    )
+
+
+def build_dependency_graph(file_index):
+    """Dependency graph of every manifest and lockfile in the index.
+
+    Returns {"nodes": {(ecosystem, name): set of versions}, "edges": {(ecosystem, name):
+    set of dependency nodes}, "direct": set of nodes, "manifests": [paths], "errors": [...]}.
+    Packages only reached through a lockfile are transitive dependencies.
+    """
+    graph = {"nodes": {}, "edges": {}, "direct": set(), "manifests": [], "errors": []}
+    for rel_path in find_manifests(file_index):
+        file_name = os.path.basename(rel_path)
+        ecosystem, parser, is_lockfile = PARSERS[file_name]
+        if file_name.endswith(".toml") or file_name == "poetry.lock":
+            if tomllib is None:
+                graph["errors"].append(f"{rel_path}: TOML parsing requires Python 3.11+")
+                continue
+        content = file_index.read_bytes(rel_path)
+        if content is None:
+            continue
+        try:
+            parsed = parser(content if file_name == "pom.xml" else content.decode("utf-8", errors="ignore"))
+        except (ValueError, ET.ParseError, AttributeError, KeyError, TypeError) as e:
+            # tomllib.TOMLDecodeError and json.JSONDecodeError are ValueErrors
+            graph["errors"].append(f"{rel_path}: {e}")
+            continue
+        graph["manifests"].append(rel_path)
+
+        if is_lockfile:
+            for name, installs in parsed.items():
+                node = (ecosystem, normalize_package_name(ecosystem, name))
+                versions = graph["nodes"].setdefault(node, set())
+                edges = graph["edges"].setdefault(node, set())
+                for version, requires in installs:
+                    if version:
+                        versions.add(version)
+                    edges.update((ecosystem, normalize_package_name(ecosystem, dependency))
+                                 for dependency in requires)
+        else:
+            for name, version in parsed.items():
+                node = (ecosystem, normalize_package_name(ecosystem, name))
+                graph["direct"].add(node)
+                versions = graph["nodes"].setdefault(node, set())
+                if version:
+                    versions.add(version)
+    return graph
+
+
+def find_vulnerable_dependencies(graph, advisory_index):
+    """Resolved dependency versions with known advisories, looked up in a local advisory index."""
+    vulnerable = []
+    for (ecosystem, name), versions in sorted(graph["nodes"].items()):
+        for version in sorted(versions):
+            advisories = advisory_index.lookup(ecosystem, name, version)
+            if advisories:
+                vulnerable.append({
+                    "ecosystem": ecosystem,
+                    "package": name,
+                    "version": version,
+                    "direct": (ecosystem, name) in graph["direct"],
+                    "advisories": advisories,
+                })
+    return vulnerable
+
+
+def most_depended_upon(graph, limit=TOP_DEPENDED_UPON):
+    """Packages required by the most other packages of the graph."""
+    dependents = Counter(dependency for edges in graph["edges"].values() for dependency in edges)
+    return [{"package": f"{ecosystem}:{name}", "dependents": count}
+            for (ecosystem, name), count in dependents.most_common(limit)]
@@ -0,0 +1,253 @@
+import os
+import re
+import struct
+import tempfile
+import zlib
+from array import array
+from collections import Counter, deque
+from functools import partial
+from heapq import nlargest
+
+from complexity import BINARY_SNIFF_BYTES, HASH_COMMENT_EXTENSIONS, NOISE_PATTERNS
+from process_pool import iter_batch_results
+from tree_reader import iter_file_contents
+
+
+# Bump when the detected clones change
+ENGINE_VERSION = 1
+
+# Normalized tokens per fingerprinted k-gram: shorter shared runs are not clones
+KGRAM_TOKENS = 25
+# Winnowing window: every shared run of KGRAM_TOKENS + WINNOW_WINDOW - 1 tokens is found
+WINNOW_WINDOW = 10
+# K-grams with fewer distinct tokens (lists of literals, tables) are not fingerprinted
+MIN_DISTINCT_TOKENS = 6
+# Fingerprints occurring more often than this are boilerplate: their lines count as
+# duplicated, but they do not produce clone pairs
+MAX_POSTINGS = 64
+# Index entries loaded into memory at once; the index is sharded on disk beyond that
+SHARD_ENTRIES = 500_000
+# Estimated source bytes per fingerprint, used to pick the number of shards up front
+BYTES_PER_FINGERPRINT = 25
+# Clone pairs tracked while merging, and reported
+MAX_TRACKED_PAIRS = 100_000
+CLONE_PAIR_LIMIT = 10
+
+HASH_BASE = 1_000_003
+HASH_MODULUS = (1 << 61) - 1
+# hash, file ID, first line, last line
+INDEX_ENTRY = struct.Struct("<QIII")
+
+# Words kept as they are; every other identifier is normalized, so renamed copies still match
+KEYWORDS = {
+    "if", "else", "elif", "elsif", "for", "foreach", "while", "do", "switch", "case", "default", "break",
+    "continue", "return", "try", "catch", "except", "finally", "throw", "raise", "def", "class", "function",
+    "func", "fn", "fun", "var", "let", "const", "new", "import", "from", "public", "private", "protected",
+    "static", "void", "int", "and", "or", "not", "in", "is", "with", "yield", "async", "await", "lambda",
+    "struct", "interface", "enum", "true", "false", "null", "None", "True", "False", "self", "this",
+}
+PYTHON_NOISE = re.compile(
+    r'#[^\n]*|"""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'')
+TOKEN_PATTERN = re.compile(r"[A-Za-z_$][\w$]*|\d[\w.]*|[^\s\w]|\n")
+
+
+def normalize_tokens(source, extension):
+    """(normalized token, line) pairs with comments, literals and identifier names abstracted away."""
+    if extension == "py":
+        noise = PYTHON_NOISE
+    else:
+        noise = NOISE_PATTERNS["php" if extension == "php" else
+                               "hash" if extension in HASH_COMMENT_EXTENSIONS else "c"]
+    # Literals become a placeholder, keeping their line breaks
+    source = noise.sub(lambda match: "S" + "\n" * match.group().count("\n"), source)
+
+    tokens, line = [], 1
+    for match in TOKEN_PATTERN.finditer(source):
+        token = match.group()
+        if token == "\n":
+            line += 1
+        elif token[0].isdigit():
+            tokens.append(("N", line))
+        elif token[0].isalpha() or token[0] in "_$":
+            tokens.append((token if token in KEYWORDS else "I", line))
+        else:
+            tokens.append((token, line))
+    return tokens
+
+
+def fingerprint(tokens):
+    """Winnowed k-gram hashes of a token list, as arrays of (hash, first line, last line)."""
+    hashes, first_lines, last_lines = array("Q"), array("I"), array("I")
+    if len(tokens) < KGRAM_TOKENS:
+        return hashes, first_lines, last_lines
+
+    token_hashes = {}
+    values = [token_hashes.setdefault(token, zlib.crc32(token.encode("utf-8"))) for token, _ in tokens]
+    top_power = pow(HASH_BASE, KGRAM_TOKENS - 1, HASH_MODULUS)
+    kgram_hash = 0
+    for value in values[:KGRAM_TOKENS]:
+        kgram_hash = (kgram_hash * HASH_BASE + value) % HASH_MODULUS
+
+    # Occurrences of each token within the current k-gram
+    kgram_counts = Counter(values[:KGRAM_TOKENS])
+
+    window = deque()  # (hash, position), increasing hashes: the front is the window minimum
+    last_selected = -1
+    for position in range(len(tokens) - KGRAM_TOKENS + 1):
+        if position:
+            outgoing, incoming = values[position - 1], values[position + KGRAM_TOKENS - 1]
+            kgram_hash = ((kgram_hash - outgoing * top_power) * HASH_BASE + incoming) % HASH_MODULUS
+            kgram_counts[incoming] += 1
+            kgram_counts[outgoing] -= 1
+            if not kgram_counts[outgoing]:
+                del kgram_counts[outgoing]
+        if len(kgram_counts) >= MIN_DISTINCT_TOKENS:
+            # Rightmost minimum wins ties, as in robust winnowing
+            while window and window[-1][0] >= kgram_hash:
+                window.pop()
+            window.append((kgram_hash, position))
+        if window and window[0][1] <= position - WINNOW_WINDOW:
+            window.popleft()
+        if window and (position >= WINNOW_WINDOW - 1 or position == len(tokens) - KGRAM_TOKENS):
+            selected_hash, selected = window[0]
+            if selected != last_selected:
+                last_selected = selected
+                hashes.append(selected_hash)
+                first_lines.append(tokens[selected][1])
+                last_lines.append(tokens[selected + KGRAM_TOKENS - 1][1])
+    return hashes, first_lines, last_lines
+
+
+def _fingerprint_batch(root, items, from_git):
+    """(path, code lines, hashes, first lines, last lines) of each readable text file."""
+    results = []
+    for rel_path, data in iter_file_contents(root, items, from_git):
+        if not data or b"\x00" in data[:BINARY_SNIFF_BYTES]:
+            continue
+        tokens = normalize_tokens(data.decode("utf-8", errors="ignore"), os.path.splitext(rel_path)[1][1:])
+        code_lines = len({line for _, line in tokens})
+        results.append((rel_path, code_lines, *fingerprint(tokens)))
+    return results
+
+
+def _merge_intervals(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _overlaps(occurrence, other):
+    """Whether two fingerprint occurrences share lines of the same file."""
+    return occurrence[0] == other[0] and occurrence[1] <= other[2] and other[1] <= occurrence[2]
+
+
+def _process_shard(path, duplicated, pairs):
+    """Find the fingerprints of one index shard that occur more than once."""
+    postings = {}
+    with open(path, "rb") as f:
+        for fingerprint_hash, file_id, first_line, last_line in INDEX_ENTRY.iter_unpack(f.read()):
+            postings.setdefault(fingerprint_hash, []).append((file_id, first_line, last_line))
+
+    touched = set()
+    for occurrences in postings.values():
+        if len(occurrences) < 2:
+            continue
+        if len(occurrences) > MAX_POSTINGS:
+            if len({file_id for file_id, _, _ in occurrences}) > 1:
+                for file_id, first_line, last_line in occurrences:
+                    duplicated.setdefault(file_id, []).append([first_line, last_line])
+                    touched.add(file_id)
+            continue
+        matched = set()
+        for i, occurrence in enumerate(occurrences):
+            for other in occurrences[i + 1:]:
+                if _overlaps(occurrence, other):
+                    continue  # A repetitive stretch matching itself
+                matched.update((occurrence, other))
+                (file_a, first_a, last_a), (file_b, first_b, last_b) = sorted((occurrence, other))
+                pair = pairs.get((file_a, file_b))
+                if pair is None:
+                    pairs[(file_a, file_b)] = [1, first_a, last_a, first_b, last_b]
+                else:
+                    pair[0] += 1
+                    pair[1], pair[2] = min(pair[1], first_a), max(pair[2], last_a)
+                    pair[3], pair[4] = min(pair[3], first_b), max(pair[4], last_b)
+        for file_id, first_line, last_line in matched:
+            duplicated.setdefault(file_id, []).append([first_line, last_line])
+            touched.add(file_id)
+
+    # Compact the line spans, and keep only the pairs sharing the most fingerprints so far
+    for file_id in touched:
+        duplicated[file_id] = _merge_intervals(duplicated[file_id])
+    if len(pairs) > MAX_TRACKED_PAIRS:
+        kept = nlargest(MAX_TRACKED_PAIRS, pairs.items(), key=lambda item: item[1][0])
+        pairs.clear()
+        pairs.update(kept)
+
+
+def detect_duplication(root, rel_paths, max_workers=None, blob_ids=None, deadline=None, total_bytes=None):
+    """Find duplicated code across files with winnowing fingerprints and an on-disk inverted index.
+
+    Time grows linearly with the amount of code. Memory grows with the size of one
+    index shard and the number of files with duplicated lines; at most
+    MAX_TRACKED_PAIRS clone pairs are kept between shards, so a pair dropped
+    early may be under-counted if it recurs later. max_workers=1 fingerprints
+    in this process instead of the shared process pool. With blob_ids, files are
+    read from the object database of the repository at root.
+    """
+    items = [(rel_path, blob_ids.get(rel_path) if blob_ids is not None else None) for rel_path in rel_paths]
+    estimated_entries = (total_bytes or 0) // BYTES_PER_FINGERPRINT
+    shard_count = max(1, estimated_entries // SHARD_ENTRIES + 1)
+
+    paths, code_lines = [], []
+    duplicated, pairs = {}, {}
+    with tempfile.TemporaryDirectory(prefix="duplication-") as index_dir:
+        shard_paths = [os.path.join(index_dir, f"{shard}.bin") for shard in range(shard_count)]
+        shard_files = [open(path, "wb", buffering=256 * 1024) for path in shard_paths]
+        try:
+            fingerprint_batch = partial(_fingerprint_batch, root, from_git=blob_ids is not None)
+            for batch in iter_batch_results(fingerprint_batch, items, max_workers, deadline):
+                for rel_path, lines, hashes, first_lines, last_lines in batch:
+                    file_id = len(paths)
+                    paths.append(rel_path)
+                    code_lines.append(lines)
+                    for fingerprint_hash, first_line, last_line in zip(hashes, first_lines, last_lines):
+                        shard_files[fingerprint_hash % shard_count].write(
+                            INDEX_ENTRY.pack(fingerprint_hash, file_id, first_line, last_line))
+        finally:
+            for shard_file in shard_files:
+                shard_file.close()
+
+        for shard_path in shard_paths:
+            _process_shard(shard_path, duplicated, pairs)
+
+    total_lines = sum(code_lines)
+    file_duplicated_lines = {
+        file_id: min(code_lines[file_id], sum(end - start + 1 for start, end in intervals))
+        for file_id, intervals in duplicated.items()}
+    duplicated_lines = sum(file_duplicated_lines.values())
+    top_pairs = sorted(pairs.items(), key=lambda item: item[1][0], reverse=True)[:CLONE_PAIR_LIMIT]
+
+    return {
+        "files_analyzed": len(paths),
+        "total_lines": total_lines,
+        "duplicated_lines": duplicated_lines,
+        "percentage": round(duplicated_lines / total_lines * 100, 2) if total_lines else 0,
+        "clone_pairs": [
+            {
+                "file_a": paths[file_a], "lines_a": f"{first_a}-{last_a}",
+                "file_b": paths[file_b], "lines_b": f"{first_b}-{last_b}",
+                "shared_fingerprints": shared,
+            }
+            for (file_a, file_b), (shared, first_a, last_a, first_b, last_b) in top_pairs
+        ],
+        "most_duplicated_files": [
+            {"file": paths[file_id], "duplicated_lines": lines}
+            for file_id, lines in sorted(
+                file_duplicated_lines.items(), key=lambda item: item[1], reverse=True)[:CLONE_PAIR_LIMIT]
+        ],
+    }
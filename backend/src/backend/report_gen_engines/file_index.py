@@ -0,0 +1,109 @@
+import os
+from collections import namedtuple
+
+
+# Directories that are listed but never descended into
+UNSCANNED_DIRS = {".git"}
+
+FileEntry = namedtuple("FileEntry", ["path", "size", "extension", "parent"])
+
+
+class FileIndex:
+    """In-memory index of a checkout, built with a single directory scan."""
+
+    # Commit the index was read from; None for a working tree
+    commit = None
+    # Relative path -> blob OID, for files whose contents are known to git
+    blob_ids = None
+
+    def __init__(self, root):
+        self.root = root
+        # Relative path ("/" separated) -> FileEntry
+        self.files = {}
+        # Relative directory path -> (subdirectory names, file names), in walk order
+        self.directories = {}
+
+    def _abspath(self, rel_path):
+        return os.path.join(self.root, *rel_path.split("/")) if rel_path else self.root
+
+    def is_file(self, rel_path):
+        return rel_path in self.files
+
+    def is_dir(self, rel_path):
+        parent, name = os.path.split(rel_path)
+        return rel_path in self.directories or name in self.directories.get(parent, ((), ()))[0]
+
+    def exists(self, rel_path):
+        return self.is_file(rel_path) or self.is_dir(rel_path)
+
+    def listdir(self, rel_path=""):
+        """Names of the subdirectories and files of a directory, like os.listdir."""
+        dirs, files = self.directories.get(rel_path, ([], []))
+        return dirs + files
+
+    def size(self, rel_path):
+        """Size in bytes of an indexed file, or None when it is not in the index."""
+        entry = self.files.get(rel_path)
+        return entry.size if entry else None
+
+    def read_bytes(self, rel_path):
+        """Contents of an indexed file, or None when it cannot be read."""
+        if rel_path not in self.files:
+            return None
+        try:
+            with open(self._abspath(rel_path), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def close(self):
+        """Release resources held by the index; nothing to do for a checkout."""
+
+    def walk(self):
+        """Yield (root, dirs, files) from the index in the same order as os.walk."""
+        for rel_dir, (dirs, files) in self.directories.items():
+            yield self._abspath(rel_dir), dirs, files
+
+
+def build_file_index(directory, subdirs=None):
+    """Scan a directory tree once, recording the size of every file.
+
+    With subdirs, only those top-level directories are indexed.
+    """
+    index = FileIndex(directory)
+    selected = set(subdirs) if subdirs else None
+    stack = [""]
+
+    while stack:
+        rel_dir = stack.pop()
+        dirs, files, descend = [], [], []
+        try:
+            with os.scandir(index._abspath(rel_dir)) as entries:
+                for entry in entries:
+                    if selected is not None and not rel_dir and entry.name not in selected:
+                        continue
+                    rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if is_dir:
+                        dirs.append(entry.name)
+                        # Like os.walk, symlinked directories are listed but not followed
+                        if entry.name not in UNSCANNED_DIRS and not entry.is_symlink():
+                            descend.append(rel_path)
+                        continue
+                    files.append(entry.name)
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        size = 0  # Broken symlink
+                    index.files[rel_path] = FileEntry(
+                        rel_path, size, os.path.splitext(entry.name)[1], rel_dir)
+        except OSError:
+            continue
+        index.directories[rel_dir] = (dirs, files)
+        # Depth-first, top-down order like os.walk
+        stack.extend(reversed(descend))
+
+    return index
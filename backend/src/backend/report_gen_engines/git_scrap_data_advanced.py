@@ -5,6 +5,25 @@ import os
 import subprocess
 from datetime import datetime
 import json
+import heapq
+import complexity
+from blob_store import lookup_or_compute
+from advisory_index import get_advisory_index
+from complexity import analyze_complexity, select_complexity_candidates
+from dependencies import build_dependency_graph, find_vulnerable_dependencies, most_depended_upon
+from duplication import detect_duplication
+from file_index import build_file_index
+from process_pool import ANALYSIS_PROCESSES
+from tree_reader import get_blob_ids
+
+# Larger files are usually generated or vendored and are not parsed
+COMPLEXITY_SIZE_LIMIT_KB = int(os.getenv("COMPLEXITY_SIZE_LIMIT_KB", "512"))
+# Files still unparsed after this many seconds are reported as skipped
+COMPLEXITY_TIME_BUDGET_SECONDS = float(os.getenv("COMPLEXITY_TIME_BUDGET_SECONDS", "120"))
+# Files not fingerprinted after this many seconds are left out of the duplication report
+DUPLICATION_TIME_BUDGET_SECONDS = float(os.getenv("DUPLICATION_TIME_BUDGET_SECONDS", "120"))
+# Most complex functions listed in the report
+COMPLEXITY_HOTSPOT_LIMIT = 10
 
 def get_issue_pr_info():
     """Placeholder for GitHub API integration for issues & PRs."""
@@ -19,24 +38,85 @@ def get_issue_pr_info():
     }
 
 
-def get_dependency_security_info():
-    """Placeholder for package.json / requirements.txt analysis."""
+def get_dependency_security_info(directory, file_index=None):
+    """Dependency graph of the project's manifests and lockfiles, checked against a local OSV dump."""
+    if file_index is None:
+        file_index = build_file_index(directory)
+    graph = build_dependency_graph(file_index)
+    advisory_index = get_advisory_index()
+    if advisory_index is not None:
+        vulnerable_dependencies = find_vulnerable_dependencies(graph, advisory_index)
+    else:
+        vulnerable_dependencies = "Requires advisory database (set OSV_DATABASE_PATH)"
+    direct_count = len(graph["direct"])
+
     return {
-        "outdated_dependencies": "Requires package analysis",
-        "vulnerable_dependencies": "Requires security database lookup",
-        "total_third_party_libraries": "Requires package analysis",
-        "direct_vs_transitive_dependencies": "Requires dependency resolver",
+        "outdated_dependencies": "Requires package registry lookup",
+        "vulnerable_dependencies": vulnerable_dependencies,
+        "total_third_party_libraries": len(graph["nodes"]),
+        "direct_vs_transitive_dependencies": {
+            "direct": direct_count,
+            "transitive": len(graph["nodes"]) - direct_count,
+        },
         "license_compatibility_issues": "Requires license checker",
+        "dependency_manifests": graph["manifests"],
+        "dependencies_by_ecosystem": dict(Counter(ecosystem for ecosystem, _ in graph["nodes"])),
+        "most_depended_upon": most_depended_upon(graph),
+        # Manifests that could not be parsed
+        "dependency_parse_errors": graph["errors"],
     }
 
 
-def get_code_quality_metrics():
-    """Placeholder for code quality analysis."""
+def get_code_quality_metrics(directory, file_index=None):
+    """Cyclomatic complexity per function and file, and duplicated code across files."""
+    if file_index is None:
+        file_index = build_file_index(directory)
+    candidates = select_complexity_candidates(file_index, COMPLEXITY_SIZE_LIMIT_KB * 1024)
+    deadline = time.monotonic() + COMPLEXITY_TIME_BUDGET_SECONDS
+
+    def analyze(rel_paths):
+        # A tree index has no checkout, so its files are read from the object database
+        blob_ids = file_index.blob_ids if file_index.commit else None
+        return analyze_complexity(directory, rel_paths, ANALYSIS_PROCESSES, blob_ids, deadline)
+
+    # Files parsed in any earlier analysis are looked up by content
+    per_file = lookup_or_compute("complexity", complexity.ENGINE_VERSION, candidates,
+                                 get_blob_ids(file_index), analyze)
+    per_file = {path: result for path, result in per_file.items() if result}
+
+    function_count = sum(result["function_count"] for result in per_file.values())
+    function_total = sum(result["function_total"] for result in per_file.values())
+    hotspots = heapq.nlargest(COMPLEXITY_HOTSPOT_LIMIT, (
+        (function[2], path, function[0], function[1])
+        for path, result in per_file.items() for function in result["functions"]))
+    most_complex_file = max(per_file, key=lambda path: per_file[path]["complexity"], default=None)
+
+    duplication = detect_duplication(
+        directory, candidates, ANALYSIS_PROCESSES, file_index.blob_ids if file_index.commit else None,
+        deadline=time.monotonic() + DUPLICATION_TIME_BUDGET_SECONDS,
+        total_bytes=sum(file_index.size(path) for path in candidates))
+
     return {
-        "cyclomatic_complexity": "Requires static analysis",
-        "code_duplication_percentage": "Requires code duplication scanner",
+        "cyclomatic_complexity": {
+            "average_per_function": round(function_total / function_count, 2) if function_count else 0,
+            "highest_per_function": hotspots[0][0] if hotspots else 0,
+            "files_analyzed": len(per_file),
+            "functions_analyzed": function_count,
+            # Source files in dependency directories, too large, binary or past the time budget
+            "files_skipped": sum(
+                1 for entry in file_index.files.values()
+                if entry.extension[1:] in complexity.COMPLEXITY_EXTENSIONS) - len(per_file),
+        },
+        "code_duplication_percentage": f"{duplication['percentage']} %",
+        "duplicated_lines": duplication["duplicated_lines"],
+        "clone_pairs": duplication["clone_pairs"],
+        "most_duplicated_files": duplication["most_duplicated_files"],
         "test_coverage_percentage": "Requires test coverage tool",
-        "most_complex_file": "Requires static analysis",
+        "most_complex_file": most_complex_file or "N/A",
+        "most_complex_file_complexity": per_file[most_complex_file]["complexity"] if most_complex_file else 0,
+        "complexity_hotspots": [
+            {"file": path, "function": name, "line": line, "complexity": value}
+            for value, path, name, line in hotspots],
     }
 
 
@@ -47,8 +127,8 @@ def get_git_info_advanced(directory):
     git_info_advanced = {}
  
     git_info_advanced.update(get_issue_pr_info())
-    git_info_advanced.update(get_code_quality_metrics())
-    git_info_advanced.update(get_dependency_security_info())
+    git_info_advanced.update(get_code_quality_metrics(directory))
+    git_info_advanced.update(get_dependency_security_info(directory))
     return git_info_advanced
 
 
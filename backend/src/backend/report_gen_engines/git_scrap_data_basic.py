@@ -5,6 +5,8 @@ from collections import Counter
 import os
 import subprocess
 import json
+import hashlib
+import tempfile
 
 
 # Configure logging
@@ -16,6 +18,35 @@ logging.basicConfig(
     ]
 )
 
+# Bump when the output of this module changes; cached analysis results are keyed on it
+ENGINE_VERSION = 3
+
+# Entries listed in the per-extension size totals and the largest files
+TOP_SIZE_ENTRIES = 10
+
+# One record per commit: full SHA, short SHA, mailmapped author, author,
+# committer timestamp, committer date (default and ISO format), subject
+HISTORY_FORMAT = "%x1e%H%x1f%h%x1f%aN%x1f%an%x1f%ct%x1f%cd%x1f%ci%x1f%s"
+HISTORY_CHUNK_SIZE = 64 * 1024
+# Number of newest commits whose subject and author are kept from the scan
+RECENT_COMMIT_LIMIT = 5
+# Commits older than this do not count towards the longest inactive period
+INACTIVITY_WINDOW_YEARS = 2
+
+# Incremental history state, stored inside the repository's git directory
+HISTORY_STATE_DIR = "analysis_history"
+HISTORY_STATE_VERSION = 3
+
+# Metrics each clone mode can compute without lazily fetching history objects.
+# The tip tree, recent commits and the last commit date are always available.
+CLONE_MODE_METRICS = {
+    "full": {"full_history", "modified_directories", "churn"},
+    "single-branch": {"full_history", "modified_directories", "churn"},
+    "blobless": {"full_history", "modified_directories"},
+    "treeless": {"full_history"},
+    "shallow": set(),
+}
+
 
 def format_date(raw_date):
     """Convert raw Git commit date to a readable format."""
@@ -36,13 +67,28 @@ def run_git_command(directory, command):
         return None  # Handle Git errors
 
 
-def get_repository_metadata(directory):
+def get_current_ref(directory, ref="HEAD"):
+    """Full name of the checked-out branch, also for worktrees detached at a branch tip.
+
+    For any other ref, its full name (e.g. refs/heads/main for main).
+    """
+    if ref != "HEAD":
+        return run_git_command(directory, ["git", "rev-parse", "--symbolic-full-name", ref]) or None
+    ref = run_git_command(directory, ["git", "symbolic-ref", "-q", "HEAD"])
+    if ref:
+        return ref
+    pointing_refs = run_git_command(directory, [
+        "git", "for-each-ref", "--points-at", "HEAD", "--format=%(refname)", "refs/heads"])
+    return pointing_refs.split("\n")[0] if pointing_refs else None
+
+
+def get_repository_metadata(directory, ref="HEAD"):
     """Fetch basic repository metadata."""
     metadata = {}
 
     # Get default branch
-    metadata["default_branch"] = run_git_command(
-        directory, ["git", "symbolic-ref", "--short", "HEAD"])
+    current_ref = get_current_ref(directory, ref)
+    metadata["default_branch"] = current_ref.split("/", 2)[-1] if current_ref else None
 
     # Get repository size (parse 'size-pack' value)
     repo_size_output = run_git_command(
@@ -59,56 +105,336 @@ def get_repository_metadata(directory):
     return metadata
 
 
-def get_commit_analysis(directory):
-    """Efficiently analyze commit history and developer activity."""
-    commit_info = {}
+def detect_clone_mode(directory):
+    """Tell how a repository was cloned: full, single-branch, blobless, treeless or shallow."""
+    if run_git_command(directory, ["git", "rev-parse", "--is-shallow-repository"]) == "true":
+        return "shallow"
 
-    # Single command to get last commit date, total commits, and contributor details
-    last_commit_date = run_git_command(
-        directory, ["git", "log", "-1", "--format=%cd"])
+    partial_filter = run_git_command(
+        directory, ["git", "config", "--get-regexp", r"^remote\..*\.partialclonefilter$"])
+    if partial_filter:
+        return "treeless" if partial_filter.split()[-1].startswith("tree:") else "blobless"
 
-    commit_count = int(run_git_command(
-        directory, ["git", "rev-list", "--count", "HEAD"]))
+    fetch_refspecs = run_git_command(
+        directory, ["git", "config", "--get-all", "remote.origin.fetch"])
+    if fetch_refspecs and "*" not in fetch_refspecs:
+        return "single-branch"
+    return "full"
 
-    # Get contributors efficiently
-    contributor_data = run_git_command(directory, ["git", "shortlog", "-sn"])
-    contributors = contributor_data.split("\n") if contributor_data else []
-    most_active_contributor = contributors[0].split(
-        "\t", 1)[-1].strip() if contributors else "N/A"
 
-    commit_info.update({
-        "last_commit_date": format_date(last_commit_date),
-        "commit_count": commit_count,
-        "total_contributors": len(contributors),
-        "most_active_contributor": most_active_contributor
-    })
-
-    # Optimize commit dates retrieval for longest inactive period
-    commit_dates_output = run_git_command(directory, [
-                                          "git", "log", "--pretty=format:%cd", "--date=iso", "--since='2 years ago'"])
-    commit_dates = [
-        datetime.fromisoformat(date.strip().replace(" ", "T"))
-        for date in commit_dates_output.split("\n") if date.strip()
-    ]
+def _unavailable(history):
+    return f"Unavailable in {history['clone_mode']} clone"
+
+
+def _since_cutoff(years):
+    """Approximate git's '--since=N years ago' as a Unix timestamp."""
+    now = datetime.now()
+    try:
+        cutoff = now.replace(year=now.year - years)
+    except ValueError:  # Feb 29 on a non-leap target year
+        cutoff = now.replace(year=now.year - years, day=28)
+    return cutoff.timestamp()
+
+
+def _iter_nul_tokens(stream):
+    """Yield the NUL-separated tokens of a binary stream without buffering all of it."""
+    buffer = b""
+    while True:
+        chunk = stream.read(HISTORY_CHUNK_SIZE)
+        if not chunk:
+            break
+        *tokens, buffer = (buffer + chunk).split(b"\x00")
+        for token in tokens:
+            yield token.decode("utf-8", errors="ignore")
+    if buffer:
+        yield buffer.decode("utf-8", errors="ignore")
+
+
+def _iter_log_records(directory, revision_range="HEAD", file_stats="numstat"):
+    """Stream `git log -z` and yield one (header, paths, churn) tuple per commit.
+
+    file_stats picks what is listed per commit: "numstat" (paths and line counts,
+    needs blobs), "name-only" (paths only, needs trees) or None (commits only).
+    """
+    stats_options = {
+        "numstat": ["--numstat"],
+        # Rename detection would lazily fetch blobs in a partial clone
+        "name-only": ["--name-only", "--no-renames"],
+        None: [],
+    }[file_stats]
+    command = ["git", "log", "-z", *stats_options,
+               f"--format={HISTORY_FORMAT}", revision_range, "--"]
+    try:
+        process = subprocess.Popen(command, cwd=directory, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except FileNotFoundError:
+        return  # Handle missing Git
+
+    header, paths, churn = None, [], 0
+    pending_rename = 0  # Remaining path tokens of a "-z" rename entry
+    try:
+        for token in _iter_nul_tokens(process.stdout):
+            if pending_rename:
+                pending_rename -= 1
+                if not pending_rename:
+                    paths.append(token)  # Keep the new path, like --name-only
+                continue
+            if token.startswith("\x1e"):
+                if header is not None:
+                    yield header, paths, churn
+                header, paths, churn = token[1:].split("\x1f", 7), [], 0
+                continue
+            if file_stats != "numstat":
+                if token.strip("\n"):
+                    paths.append(token.lstrip("\n"))
+                continue
+            parts = token.lstrip("\n").split("\t", 2)
+            if len(parts) < 3:
+                continue
+            added, deleted, path = parts
+            if added.isdigit() and deleted.isdigit():
+                churn += int(added) + int(deleted)
+            if path:
+                paths.append(path)
+            else:
+                pending_rename = 2  # Old and new path follow as separate tokens
+        if header is not None:
+            yield header, paths, churn
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def _scan_revision_range(directory, revision_range="HEAD", clone_mode="full"):
+    """Fold the commits of one revision range into a mergeable aggregate state."""
+    activity_cutoff = _since_cutoff(INACTIVITY_WINDOW_YEARS)
+    metrics = CLONE_MODE_METRICS[clone_mode]
+    if "churn" in metrics:
+        file_stats = "numstat"
+    elif "modified_directories" in metrics:
+        file_stats = "name-only"
+    else:
+        file_stats = None
+
+    state = {
+        "clone_mode": clone_mode,
+        "head_sha": None,
+        "commit_count": 0,
+        "last_commit_date": None,
+        "first_commit_date": None,
+        "first_commit_timestamp": None,
+        # Newest commits first, by committer timestamp like `git log`
+        "recent_commits": [],
+        "recent_authors": [],
+        "recent_timestamps": [],
+        "author_commits": Counter(),
+        "directory_changes": Counter(),
+        # [committer timestamp, lines changed] within the inactivity window, newest first
+        "activity": [],
+    }
+
+    for header, paths, churn in _iter_log_records(directory, revision_range, file_stats):
+        if len(header) < 8:
+            continue
+        sha, short_sha, mailmap_author, author, timestamp, date, iso_date, subject = header
+        timestamp = int(timestamp)
+
+        if state["commit_count"] == 0:
+            state["head_sha"] = sha
+            state["last_commit_date"] = date
+        if state["commit_count"] < RECENT_COMMIT_LIMIT:
+            state["recent_commits"].append(f"{short_sha} - {subject}")
+            state["recent_authors"].append(author)
+            state["recent_timestamps"].append(timestamp)
+        state["commit_count"] += 1
+        state["first_commit_date"] = iso_date
+        state["first_commit_timestamp"] = timestamp
+        state["author_commits"][mailmap_author] += 1
+
+        if timestamp >= activity_cutoff:
+            state["activity"].append([timestamp, churn])
+
+        for path in paths:
+            parent = os.path.dirname(path)
+            if parent:
+                state["directory_changes"][parent] += 1
+
+    # Clock skew can put a commit after an older one in log order
+    state["activity"].sort(key=lambda entry: entry[0], reverse=True)
+    return state
+
+
+def _newest_commits(*states):
+    """The recent commits of the given states, newest first; earlier states win ties."""
+    commits = [commit for state in states for commit in zip(
+        state["recent_timestamps"], state["recent_commits"], state["recent_authors"])]
+    commits = sorted(commits, key=lambda commit: commit[0], reverse=True)[:RECENT_COMMIT_LIMIT]
+    return {
+        "recent_commits": [commit for _, commit, _ in commits],
+        "recent_authors": [author for _, _, author in commits],
+        "recent_timestamps": [timestamp for timestamp, _, _ in commits],
+    }
+
+
+def _merge_history_states(newer, older):
+    """Merge the state of `last_sha..HEAD` on top of the previously stored state."""
+    # Insert the newer keys first so most_common() breaks ties like a full scan would
+    directory_changes = Counter(newer["directory_changes"])
+    directory_changes.update(older["directory_changes"])
+    # A merged branch can bring commits older than the stored ones, so both are ordered like a full scan
+    activity_cutoff = _since_cutoff(INACTIVITY_WINDOW_YEARS)
+    activity = sorted((entry for entry in newer["activity"] + older["activity"] if entry[0] >= activity_cutoff),
+                      key=lambda entry: entry[0], reverse=True)
+
+    merged = {
+        "clone_mode": newer["clone_mode"],
+        "head_sha": newer["head_sha"] or older["head_sha"],
+        "commit_count": newer["commit_count"] + older["commit_count"],
+        "last_commit_date": newer["last_commit_date"] or older["last_commit_date"],
+        "first_commit_date": older["first_commit_date"],
+        "first_commit_timestamp": older["first_commit_timestamp"],
+        **_newest_commits(newer, older),
+        "author_commits": newer["author_commits"] + older["author_commits"],
+        "directory_changes": directory_changes,
+        "activity": activity,
+    }
+
+    # A merged-in unrelated history can bring an older root commit
+    if newer["first_commit_timestamp"] is not None and (
+            older["first_commit_timestamp"] is None
+            or newer["first_commit_timestamp"] < older["first_commit_timestamp"]):
+        merged["first_commit_date"] = newer["first_commit_date"]
+        merged["first_commit_timestamp"] = newer["first_commit_timestamp"]
+
+    return merged
 
-    if len(commit_dates) > 1:
-        max_gap = max(
-            (commit_dates[i] - commit_dates[i + 1]).days for i in range(len(commit_dates) - 1)
-        )
+
+def _history_state_path(directory, ref="HEAD"):
+    """Locate the persisted history state of a ref (the checked-out one by default)."""
+    git_dir = run_git_command(
+        directory, ["git", "rev-parse", "--path-format=absolute", "--git-common-dir"])
+    if not git_dir:
+        return None
+    ref = get_current_ref(directory, ref) or ref
+    ref_key = hashlib.sha1(ref.encode("utf-8")).hexdigest()
+    return os.path.join(git_dir, HISTORY_STATE_DIR, f"{ref_key}.json")
+
+
+def load_history_state(directory, ref="HEAD"):
+    """Load the stored aggregate state for a repository, or None when absent or stale."""
+    state_path = _history_state_path(directory, ref)
+    if not state_path or not os.path.isfile(state_path):
+        return None
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if stored.get("version") != HISTORY_STATE_VERSION:
+        return None
+
+    state = stored["state"]
+    state["author_commits"] = Counter(state["author_commits"])
+    state["directory_changes"] = Counter(state["directory_changes"])
+    return state
+
+
+def save_history_state(directory, state, ref="HEAD"):
+    """Persist the aggregate state next to the repository's object database."""
+    state_path = _history_state_path(directory, ref)
+    if not state_path:
+        return
+    try:
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        # A temp file of its own, so concurrent analyses of the same ref never write into each other's
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(state_path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": HISTORY_STATE_VERSION, "state": state}, f)
+            os.replace(temp_path, state_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+    except OSError as e:
+        logging.warning(f"Could not save commit history state: {e}")
+
+
+def scan_commit_history(directory, incremental=True, ref="HEAD"):
+    """Collect every commit-derived metric, only walking commits added since the last scan."""
+    head_sha = run_git_command(directory, ["git", "rev-parse", "--verify", "-q", f"{ref}^{{commit}}"])
+    clone_mode = detect_clone_mode(directory)
+    stored = load_history_state(directory, ref) if incremental else None
+    if stored and stored["clone_mode"] != clone_mode:
+        stored = None  # The clone was converted, e.g. unshallowed
+
+    if stored and stored["head_sha"] == head_sha:
+        state = stored
+    elif stored and head_sha and run_git_command(
+            directory, ["git", "merge-base", "--is-ancestor", stored["head_sha"], head_sha]) is not None:
+        logging.info(f"Updating commit history state from {stored['head_sha'][:12]}")
+        state = _merge_history_states(
+            _scan_revision_range(directory, f"{stored['head_sha']}..{head_sha}", clone_mode), stored)
     else:
-        max_gap = 0
+        if stored:
+            logging.info("History was rewritten, rebuilding commit history state")
+        state = _scan_revision_range(directory, head_sha or ref, clone_mode)
+
+    if head_sha and state is not stored:
+        save_history_state(directory, state, ref)
+
+    return summarize_history_state(state)
+
+
+def summarize_history_state(state):
+    """Derive the inactivity gap and yearly churn from the stored activity window."""
+    inactivity_cutoff = _since_cutoff(INACTIVITY_WINDOW_YEARS)
+    churn_cutoff = _since_cutoff(1)
+
+    history = dict(state)
+    history["available_metrics"] = CLONE_MODE_METRICS[state["clone_mode"]]
+    history["longest_gap_days"] = None
+    history["lines_changed_last_year"] = 0
+
+    previous_timestamp = None
+    in_churn_window = True
+    for timestamp, churn in state["activity"]:
+        if timestamp < inactivity_cutoff:
+            break  # The window moves forward between runs
+        if previous_timestamp is not None:
+            gap = (previous_timestamp - timestamp) // 86400
+            if history["longest_gap_days"] is None or gap > history["longest_gap_days"]:
+                history["longest_gap_days"] = gap
+        previous_timestamp = timestamp
+
+        if in_churn_window and timestamp < churn_cutoff:
+            in_churn_window = False
+        if in_churn_window:
+            history["lines_changed_last_year"] += churn
+
+    return history
+
 
-    commit_info["longest_inactive_period_for_repository"] = f'{max_gap} Days'
+def get_commit_analysis(directory, history=None):
+    """Efficiently analyze commit history and developer activity."""
+    if history is None:
+        history = scan_commit_history(directory)
+
+    # Same ordering as `git shortlog -sn`: most commits first, then by name
+    contributors = sorted(history["author_commits"].items(),
+                          key=lambda item: (-item[1], item[0]))
+    most_active_contributor = contributors[0][0] if contributors else "N/A"
 
-    # Optimize computing average lines changed per commit
-    numstat_output = run_git_command(
-        directory, ["git", "log", "--numstat", "--since='1 year ago'"])
-    total_changes = sum(
-        int(parts[0]) + int(parts[1]
-                            ) if parts[0].isdigit() and parts[1].isdigit() else 0
-        for line in numstat_output.split("\n")
-        if (parts := line.split()) and len(parts) >= 2
-    )
+    commit_info = {
+        "last_commit_date": format_date(history["last_commit_date"] or ""),
+        "commit_count": history["commit_count"],
+        "total_contributors": len(contributors),
+        "most_active_contributor": most_active_contributor,
+        "longest_inactive_period_for_repository": f'{history["longest_gap_days"] or 0} Days',
+    }
+    if "full_history" not in history["available_metrics"]:
+        for key in ["commit_count", "total_contributors", "most_active_contributor",
+                    "longest_inactive_period_for_repository"]:
+            commit_info[key] = _unavailable(history)
 
     return commit_info
 
@@ -119,18 +445,23 @@ def get_branch_info(directory):
     return {"branch_count": len([b for b in branches.split("\n") if b.strip()])}
 
 
-def get_recent_commit_messages(directory, num_commits=5):
+def get_recent_commit_messages(directory, num_commits=5, history=None, ref="HEAD"):
     """Fetch recent commit messages."""
+    if history is not None and num_commits <= RECENT_COMMIT_LIMIT:
+        return {"recent_commits": history["recent_commits"][:num_commits]}
     commits = run_git_command(
-        directory, ["git", "log", f"-{num_commits}", '--pretty=format:%h - %s'])
+        directory, ["git", "log", f"-{num_commits}", '--pretty=format:%h - %s', ref, "--"])
     return {"recent_commits": commits.split("\n") if commits else []}
 
 
-def get_repository_age(directory):
+def get_repository_age(directory, history=None):
     """Get the date of the first commit and calculate the repo age."""
-    first_commit_date_str = run_git_command(
-        directory, ["git", "log", "--reverse", "--format=%cd", "--date=iso"]).split("\n")[0]
+    if history is None:
+        history = scan_commit_history(directory)
+    first_commit_date_str = history["first_commit_date"]
 
+    if "full_history" not in history["available_metrics"]:
+        return {"repo_first_commit": _unavailable(history), "repo_age": _unavailable(history)}
     if not first_commit_date_str:
         return {"repo_age": "Unknown"}
 
@@ -150,44 +481,56 @@ def get_repository_age(directory):
     }
 
 
-def get_largest_file(directory):
+def build_size_index(directory, ref="HEAD"):
+    """Map every file path of a ref's tree to its size, read from the object database.
+
+    Needs no working tree, so it also works on bare mirrors and for any branch.
+    """
+    command = ["git", "ls-tree", "-r", "-l", "-z", "--full-tree", ref]
+    try:
+        process = subprocess.Popen(command, cwd=directory, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except FileNotFoundError:
+        return {}  # Handle missing Git
+
+    size_index = {}
+    try:
+        # Each entry is "<mode> <type> <object> <size>\t<path>"
+        for token in _iter_nul_tokens(process.stdout):
+            info, _, path = token.partition("\t")
+            fields = info.split()
+            if len(fields) == 4 and fields[1] == "blob" and fields[3].isdigit():
+                size_index[path] = int(fields[3])
+    finally:
+        process.stdout.close()
+        process.wait()
+    return size_index
+
+
+def get_largest_file(directory, size_index=None):
     """Find the largest file in the repo."""
-    largest_file = run_git_command(directory, ["git", "ls-files", "-z"])
-    if largest_file:
-        file_sizes = {file: os.path.getsize(os.path.join(
-            directory, file)) for file in largest_file.split("\x00") if file}
-        largest = max(file_sizes, key=file_sizes.get, default="N/A")
-        return {"largest_file": largest, "size_bytes": file_sizes.get(largest, 0)}
+    if size_index is None:
+        size_index = build_size_index(directory)
+    if size_index:
+        largest = max(size_index, key=size_index.get)
+        return {"largest_file": largest, "size_bytes": size_index[largest]}
     return {"largest_file_in_repository": "N/A", "size_bytes": 0}
 
 
-def get_repository_activity(directory):
+def get_repository_activity(directory, history=None):
     """Fetch last contributors and most modified directories."""
+    if history is None:
+        history = scan_commit_history(directory)
     activity = {}
 
     # Get last 5 unique contributors
-    contributors_output = run_git_command(
-        directory, ["git", "log", "--format=%an", "-5"])
-    activity["last_5_contributors"] = list(
-        set(contributors_output.split("\n"))) if contributors_output else []
-
-    # Get modified files and extract directory names
-    modified_files_output = run_git_command(
-        directory, ["git", "log", "--name-only", "--pretty=format:"])
-    modified_files = [f.strip()
-                      for f in modified_files_output.split("\n") if f.strip()]
-
-    if modified_files:
-        # Convert file paths to directories
-        modified_dirs = [os.path.dirname(
-            f) for f in modified_files if os.path.dirname(f)]
-        # Get the top 3 most modified directories
-        top_dirs = [dir_name for dir_name,
-                    _ in Counter(modified_dirs).most_common(5)]
-    else:
-        top_dirs = []
+    activity["last_5_contributors"] = list(set(history["recent_authors"]))
 
-    activity["top_5_modified_directories"] = top_dirs
+    # Get the top 5 most modified directories
+    activity["top_5_modified_directories"] = [
+        dir_name for dir_name, _ in history["directory_changes"].most_common(5)]
+    if "modified_directories" not in history["available_metrics"]:
+        activity["top_5_modified_directories"] = _unavailable(history)
 
     return activity
 
@@ -202,54 +545,66 @@ def format_size(bytes_size):
     return f"{bytes_size:.2f} {suffixes[i]}"
 
 
-def get_file_directory_insights(directory):
-    """Analyze file structures and extensions without using Unix commands."""
-    file_list_output = run_git_command(directory, ["git", "ls-files"])
+def get_file_directory_insights(directory, size_index=None):
+    """Analyze file structures, extensions and sizes from the object database."""
+    if size_index is None:
+        size_index = build_size_index(directory)
 
-    if not file_list_output:
+    if not size_index:
         return {"average_file_size": "0 B", "most_frequent_extension": "N/A"}
 
-    file_list = file_list_output.split("\n")
-
-    # Count file extensions
-    ext_count = Counter(os.path.splitext(f)[1] if os.path.splitext(f)[
-                        1] else "No Extension" for f in file_list)
+    # Count file extensions and their total size
+    ext_count = Counter()
+    ext_size = Counter()
+    for path, size in size_index.items():
+        ext = os.path.splitext(path)[1] or "No Extension"
+        ext_count[ext] += 1
+        ext_size[ext] += size
     most_frequent_ext = ext_count.most_common(1)[0][0] if ext_count else "N/A"
 
-    # Get file sizes manually
-    file_sizes = []
-    for file in file_list:
-        file_path = os.path.join(directory, file)
-        if os.path.isfile(file_path):
-            file_sizes.append(os.path.getsize(file_path))
-
-    avg_file_size = sum(file_sizes) / len(file_sizes) if file_sizes else 0
+    avg_file_size = sum(size_index.values()) / len(size_index)
     formatted_avg_size = format_size(avg_file_size)
 
+    largest_files = sorted(size_index.items(), key=lambda item: item[1], reverse=True)
+
     return {
         "average_file_size": formatted_avg_size,
-        "most_frequent_extension": most_frequent_ext
+        "most_frequent_extension": most_frequent_ext,
+        "size_by_extension": {
+            ext: format_size(size) for ext, size in ext_size.most_common(TOP_SIZE_ENTRIES)},
+        "largest_files": [
+            {"file": path, "size": format_size(size)} for path, size in largest_files[:TOP_SIZE_ENTRIES]],
     }
 
 
-def get_git_info(directory):
-    """Main function to collect all repository insights."""
+def get_git_info(directory, ref="HEAD"):
+    """Main function to collect all repository insights.
+
+    Everything is read from the object database, so any ref can be analyzed
+    without checking it out.
+    """
     git_info = {}
+    # Walk the commit history once and share it with every commit-derived metric
+    history = scan_commit_history(directory, ref=ref)
+    # Partial and shallow clones cannot provide every metric
+    git_info["clone_mode"] = history["clone_mode"]
     # Basic repo details (size, name, default branch)
-    git_info.update(get_repository_metadata(directory))
+    git_info.update(get_repository_metadata(directory, ref))
     # Establish repo's historical timeline
-    git_info.update(get_repository_age(directory))
+    git_info.update(get_repository_age(directory, history))
     git_info.update(get_branch_info(directory))  # Analyze branches
     git_info.update(get_recent_commit_messages(
-        directory))  # Recent commit activity
+        directory, history=history))  # Recent commit activity
     # Contributor and commit trends
-    git_info.update(get_commit_analysis(directory))
+    git_info.update(get_commit_analysis(directory, history))
     # Activity trends & periods of inactivity
-    git_info.update(get_repository_activity(directory))
+    git_info.update(get_repository_activity(directory, history))
+    # File sizes of the analyzed tree, read once from the object database
+    size_index = build_size_index(directory, ref)
     # Identify the largest files in the repo
-    git_info.update(get_largest_file(directory))
+    git_info.update(get_largest_file(directory, size_index))
     # File type distributions & directory structures
-    git_info.update(get_file_directory_insights(directory))
+    git_info.update(get_file_directory_insights(directory, size_index))
 
     return git_info
 
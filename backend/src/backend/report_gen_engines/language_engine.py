@@ -2,10 +2,21 @@ import os
 import xml.etree.ElementTree as ET
 import json
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import re
 from datetime import datetime
 from git_scrap_data_basic import get_git_info
+from git_scrap_data_advanced import get_code_quality_metrics, get_dependency_security_info
+import git_scrap_data_basic
+import complexity
+import dependencies
+import duplication
+import secret_scanner
+from file_index import build_file_index
+from secret_scanner import scan_secrets, select_scan_candidates
+from tree_reader import build_tree_index, get_blob_ids
+from blob_store import lookup_or_compute
+from process_pool import ANALYSIS_PROCESSES
 import logging
 import time
 from dotenv import load_dotenv
@@ -45,38 +56,54 @@ IGNORED_FILES = {"README.md", "README.txt", "LICENSE", "CONTRIBUTING.md"}
 # File size limit (in MB) to skip large non-code files
 FILE_SIZE_LIMIT_MB = 5
 
-
-def detect_frameworks(DIRECTORY):
+# Bump when the output of this module changes; cached analysis results are keyed on it
+ENGINE_VERSION = 2
+# Version of the whole pipeline, combining every engine that feeds analyze_folder
+ANALYSIS_ENGINE_VERSION = (
+    f"language-{ENGINE_VERSION}"
+    f"+git-{git_scrap_data_basic.ENGINE_VERSION}"
+    f"+secrets-{secret_scanner.ENGINE_VERSION}"
+    f"+complexity-{complexity.ENGINE_VERSION}"
+    f"+duplication-{duplication.ENGINE_VERSION}"
+    f"+dependencies-{dependencies.ENGINE_VERSION}"
+)
+
+# Number of detectors analyze_folder runs concurrently
+DETECTOR_WORKERS = int(os.getenv("DETECTOR_WORKERS", "4"))
+
+
+def detect_frameworks(DIRECTORY, file_index=None):
+    if file_index is None:
+        file_index = build_file_index(DIRECTORY)
     frameworks = set()
 
-    def parse_json_file(filepath, keys):
+    def parse_json_file(filename, keys):
         """Parse JSON file and extract dependencies from given keys."""
-        if os.path.exists(filepath):
+        content = file_index.read_bytes(filename)
+        if content is not None:
             try:
-                with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-                    data = json.load(f)
-                    extracted = set()
-                    for key in keys:
-                        extracted.update(data.get(key, {}).keys())
-                    return extracted
+                data = json.loads(content.decode("utf-8", errors="ignore"))
+                extracted = set()
+                for key in keys:
+                    extracted.update(data.get(key, {}).keys())
+                return extracted
             except json.JSONDecodeError:
                 pass
         return set()
 
     # Check for JavaScript dependencies
-    frameworks.update(parse_json_file(os.path.join(
-        DIRECTORY, "package.json"), ["dependencies", "devDependencies"]))
+    frameworks.update(parse_json_file(
+        "package.json", ["dependencies", "devDependencies"]))
 
     # Check for PHP dependencies
-    frameworks.update(parse_json_file(os.path.join(
-        DIRECTORY, "composer.json"), ["require", "require-dev"]))
+    frameworks.update(parse_json_file(
+        "composer.json", ["require", "require-dev"]))
 
     # Check for Java Maven dependencies
-    pom_xml = os.path.join(DIRECTORY, "pom.xml")
-    if os.path.exists(pom_xml):
+    pom_xml = file_index.read_bytes("pom.xml")
+    if pom_xml is not None:
         try:
-            tree = ET.parse(pom_xml)
-            root = tree.getroot()
+            root = ET.fromstring(pom_xml)
             # Handle Maven XML namespace
             ns = {'mvn': 'http://maven.apache.org/POM/4.0.0'}
             frameworks.update(dep.text for dep in root.findall(
@@ -85,25 +112,25 @@ def detect_frameworks(DIRECTORY):
             pass
 
     # Check for Python dependencies
-    requirements_txt = os.path.join(DIRECTORY, "requirements.txt")
-    if os.path.exists(requirements_txt):
+    requirements_txt = file_index.read_bytes("requirements.txt")
+    if requirements_txt is not None:
         try:
-            with open(requirements_txt, "r", encoding="utf-8") as f:
-                frameworks.update([line.strip().split("==")[0]
-                                  for line in f if line.strip()])
+            frameworks.update([line.strip().split("==")[0]
+                              for line in requirements_txt.decode("utf-8").splitlines() if line.strip()])
         except Exception:
             pass
 
     # Check for .NET projects
-    if any(file.endswith(".csproj") for file in os.listdir(DIRECTORY)):
+    top_level = file_index.listdir()
+    if any(file.endswith(".csproj") for file in top_level):
         frameworks.add(".NET")
 
     # Check for PHP frameworks
-    if os.path.exists(os.path.join(DIRECTORY, "artisan")):
+    if file_index.exists("artisan"):
         frameworks.add("Laravel")
-    if os.path.exists(os.path.join(DIRECTORY, "bin/console")):
+    if file_index.exists("bin/console"):
         frameworks.add("Symfony")
-    if os.path.exists(os.path.join(DIRECTORY, "index.php")):
+    if file_index.exists("index.php"):
         frameworks.add("PHP Web")
 
     # Check for JavaScript frameworks
@@ -114,11 +141,11 @@ def detect_frameworks(DIRECTORY):
     }
 
     for file, framework in js_frameworks.items():
-        if os.path.exists(os.path.join(DIRECTORY, file)):
+        if file_index.exists(file):
             frameworks.add(framework)
 
     # Check for Vue.js and Svelte
-    for file in os.listdir(DIRECTORY):
+    for file in top_level:
         if file.endswith(".vue"):
             frameworks.add("Vue.js")
         if file.endswith(".svelte"):
@@ -135,11 +162,13 @@ def detect_frameworks(DIRECTORY):
     return list(frameworks)
 
 
-def determine_project_architecture(DIRECTORY):
+def determine_project_architecture(DIRECTORY, file_index=None):
+    if file_index is None:
+        file_index = build_file_index(DIRECTORY)
     has_docker, has_k8s, has_serverless, has_event_driven, has_layered, has_hexagonal = False, False, False, False, False, False
     service_dirs = []
 
-    for root, dirs, files in os.walk(DIRECTORY):
+    for root, dirs, files in file_index.walk():
         if "Dockerfile" in files or "docker-compose.yml" in files:
             has_docker = True
         if any(file.endswith(".yaml") and "k8s" in file for file in files):
@@ -170,9 +199,11 @@ def determine_project_architecture(DIRECTORY):
     return "Monolithic"
 
 
-def check_license_and_secrets(DIRECTORY):
+def check_license_and_secrets(DIRECTORY, file_index=None):
+    if file_index is None:
+        file_index = build_file_index(DIRECTORY)
     security_info = {"license": None, "potential_secrets": []}
-    license_file = os.path.join(DIRECTORY, "LICENSE")
+    license_file = file_index.read_bytes("LICENSE")
 
     # Detect common licenses from first few lines
     license_map = {
@@ -183,44 +214,55 @@ def check_license_and_secrets(DIRECTORY):
         "Mozilla Public License": "MPL",
     }
 
-    if os.path.exists(license_file):
-        with open(license_file, "r", encoding="utf-8", errors="ignore") as f:
-            first_lines = "\n".join(f.readlines()[:10])  # Read first 10 lines
-            for key, license_type in license_map.items():
-                if key in first_lines:
-                    security_info["license"] = license_type
-                    break  # Stop checking once a match is found
-
-    # Enhanced secret detection patterns
-    secret_patterns = re.compile(
-        r"(API_KEY|SECRET_KEY|TOKEN|PASSWORD|ACCESS_KEY|PRIVATE_KEY)\s*=\s*[\'\"].+[\'\"]")
-
-    for root, _, files in os.walk(DIRECTORY):
-        for file in files:
-            if file.endswith((".env", "config.json", "settings.py", "config.yaml")):
-                file_path = os.path.join(root, file)
-                with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-                    security_info["potential_secrets"].extend(
-                        secret_patterns.findall(f.read()))
+    if license_file is not None:
+        license_lines = license_file.decode("utf-8", errors="ignore").splitlines(keepends=True)
+        first_lines = "\n".join(license_lines[:10])  # Read first 10 lines
+        for key, license_type in license_map.items():
+            if key in first_lines:
+                security_info["license"] = license_type
+                break  # Stop checking once a match is found
+
+    # Scan every text file under the size limit, reporting file and line per hit
+    candidates = select_scan_candidates(file_index, FILE_SIZE_LIMIT_MB * 1024 * 1024)
+
+    def scan(rel_paths):
+        found = {rel_path: [] for rel_path in rel_paths}
+        # A tree index has no checkout, so its files are read from the object database
+        blob_ids = file_index.blob_ids if file_index.commit else None
+        for hit in scan_secrets(DIRECTORY, rel_paths, ANALYSIS_PROCESSES, blob_ids):
+            found[hit["file"]].append([hit["line"], hit["type"]])
+        return found
+
+    # Files already scanned in any earlier analysis are looked up by content
+    findings = lookup_or_compute("secret_scanner", secret_scanner.ENGINE_VERSION, candidates,
+                                 get_blob_ids(file_index), scan)
+    security_info["potential_secrets"] = [
+        {"file": rel_path, "line": line, "type": kind}
+        for rel_path in candidates for line, kind in findings[rel_path]]
 
     return security_info
 
 
-def check_testing_and_docs(DIRECTORY):
+def check_testing_and_docs(DIRECTORY, file_index=None):
+    if file_index is None:
+        file_index = build_file_index(DIRECTORY)
     return {
-        "has_readme": os.path.isfile(os.path.join(DIRECTORY, "README.md")),
-        "has_docs": os.path.isdir(os.path.join(DIRECTORY, "docs")),
-        "has_tests": any(os.path.isdir(os.path.join(DIRECTORY, test_dir)) for test_dir in ["tests", "test", "spec"])
+        "has_readme": file_index.is_file("README.md"),
+        "has_docs": file_index.is_dir("docs"),
+        "has_tests": any(file_index.is_dir(test_dir) for test_dir in ["tests", "test", "spec"])
     }
 
 
-def analyze_folder(DIRECTORY, GIT_SCRAP_FILE):
+def get_language_usage(DIRECTORY, file_index=None):
+    if file_index is None:
+        file_index = build_file_index(DIRECTORY)
     file_counts = defaultdict(int)
     total_files = 0
     total_folders = 0
 
-    for root, dirs, files in os.walk(DIRECTORY):
-        if any(ignored in root for ignored in IGNORED_DIRS):
+    for root, dirs, files in file_index.walk():
+        # Relative, so a checkout or mirror path such as "repo.git" is not ignored itself
+        if any(ignored in os.path.relpath(root, file_index.root) for ignored in IGNORED_DIRS):
             continue
         total_folders += len(dirs)
         for file in files:
@@ -236,11 +278,85 @@ def analyze_folder(DIRECTORY, GIT_SCRAP_FILE):
         for lang, count in file_counts.items()
     } if total_files > 0 else {}
 
-    frameworks = detect_frameworks(DIRECTORY)
-    git_info = get_git_info(DIRECTORY)
-    project_architecture = determine_project_architecture(DIRECTORY)
-    security_info = check_license_and_secrets(DIRECTORY)
-    documentation = check_testing_and_docs(DIRECTORY)
+    return {
+        "total_files": total_files,
+        "total_folders": total_folders,
+        "language_usage": language_usage,
+    }
+
+
+def _timed(detector, *args):
+    """Call a detector and return its result with the elapsed wall time in seconds."""
+    start_time = time.perf_counter()
+    result = detector(*args)
+    return result, round(time.perf_counter() - start_time, 3)
+
+
+def run_detectors(detectors, max_workers=DETECTOR_WORKERS, on_stage_complete=None):
+    """Run independent detectors concurrently and record the wall time of each one.
+
+    on_stage_complete(name, result, completed, total) is called as each detector
+    finishes; an exception raised from it stops the remaining detectors.
+    """
+    results, timings = {}, {}
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {
+            executor.submit(_timed, detector, *args): name
+            for name, (detector, args) in detectors.items()
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            name = futures[future]
+            results[name], timings[name] = future.result()
+            if on_stage_complete:
+                on_stage_complete(name, results[name], completed, len(futures))
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return results, {name: timings[name] for name in detectors}
+
+
+def analyze_folder(DIRECTORY, GIT_SCRAP_FILE=None, max_workers=DETECTOR_WORKERS, on_stage_complete=None,
+                   selected_subdirs=None, ref=None):
+    """Analyze a checkout, or with ref, any commit or branch straight from the object database.
+
+    Analyses of different refs share nothing but the repository, so they can
+    run concurrently against one clone (or bare mirror).
+    """
+    # Scan the checkout (or the ref's tree) once and let every detector query the index
+    if ref is None:
+        file_index, index_time = _timed(build_file_index, DIRECTORY, selected_subdirs)
+    else:
+        file_index, index_time = _timed(build_tree_index, DIRECTORY, ref, selected_subdirs)
+        if file_index is None:
+            raise ValueError(f"Unknown ref: {ref}")
+
+    # Detectors mostly wait on git subprocesses and disk reads, so threads overlap well
+    try:
+        results, stage_timings = run_detectors({
+            "language_usage": (get_language_usage, (DIRECTORY, file_index)),
+            "frameworks": (detect_frameworks, (DIRECTORY, file_index)),
+            "git_info": (get_git_info, (DIRECTORY, ref or "HEAD")),
+            "project_architecture": (determine_project_architecture, (DIRECTORY, file_index)),
+            "security_info": (check_license_and_secrets, (DIRECTORY, file_index)),
+            "documentation": (check_testing_and_docs, (DIRECTORY, file_index)),
+            "code_quality": (get_code_quality_metrics, (DIRECTORY, file_index)),
+            "dependency_security": (get_dependency_security_info, (DIRECTORY, file_index)),
+        }, max_workers, on_stage_complete)
+    finally:
+        file_index.close()
+    stage_timings = {"file_index": index_time, **stage_timings}
+
+    language_stats = results["language_usage"]
+    total_files = language_stats["total_files"]
+    total_folders = language_stats["total_folders"]
+    language_usage = language_stats["language_usage"]
+    frameworks = results["frameworks"]
+    git_info = results["git_info"]
+    project_architecture = results["project_architecture"]
+    security_info = results["security_info"]
+    documentation = results["documentation"]
+    code_quality = results["code_quality"]
+    dependency_security = results["dependency_security"]
 
     analysis_data = {
         "project_architecture": project_architecture or "",
@@ -251,6 +367,10 @@ def analyze_folder(DIRECTORY, GIT_SCRAP_FILE):
         "git_info": git_info or "",
         "security_info": security_info or "",
         "documentation": documentation or "",
+        "code_quality": code_quality or "",
+        "dependency_security": dependency_security or "",
+        # Wall time of each detector in seconds, to see which stage dominates
+        "stage_timings": stage_timings,
     }
 
     # Save to JSON file
@@ -260,7 +380,7 @@ def analyze_folder(DIRECTORY, GIT_SCRAP_FILE):
 
         logging.info(f"Analysis saved to {GIT_SCRAP_FILE}")
     else:
-        logging.error("No valid output file path provided.")
+        logging.info("No output file path provided, analysis not saved to disk.")
 
     return analysis_data
 
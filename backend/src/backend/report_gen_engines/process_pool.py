@@ -0,0 +1,61 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+# Processes shared by the CPU-bound detectors (secret scan, complexity, duplication) of every analysis
+ANALYSIS_PROCESSES = int(os.getenv("ANALYSIS_PROCESSES", str(os.cpu_count() or 1)))
+# Detectors run on threads, and a process forked from a multithreaded one can inherit locks held
+# by the other threads; forkserver and spawn start workers from a clean process instead
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+# Files handed to each worker at a time
+SCAN_BATCH_SIZE = 64
+# Below this many files a process pool costs more than it saves
+PARALLEL_MIN_FILES = 200
+
+_process_pool = None
+_process_pool_guard = threading.Lock()
+
+
+def get_process_pool():
+    """The process pool shared by every detector in this process, started on first use."""
+    global _process_pool
+    with _process_pool_guard:
+        # A pool whose worker died refuses new work, so replace it instead of failing every later analysis
+        if _process_pool is None or _process_pool._broken:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=max(1, ANALYSIS_PROCESSES), mp_context=multiprocessing.get_context(START_METHOD))
+        return _process_pool
+
+
+def iter_batch_results(batch_func, items, max_workers=None, deadline=None):
+    """Yield batch_func(batch) for batches of items, in completion order.
+
+    Large inputs fan out across the shared process pool, so batch_func must be
+    picklable (a module-level function or a partial of one); max_workers=1 runs
+    every batch in this process. Batches not started by deadline (a
+    time.monotonic() value) are skipped, so the results may cover only part of items.
+    """
+    batches = [items[i:i + SCAN_BATCH_SIZE] for i in range(0, len(items), SCAN_BATCH_SIZE)]
+    if len(items) < PARALLEL_MIN_FILES or max_workers == 1:
+        for batch in batches:
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            yield batch_func(batch)
+        return
+
+    pending = {get_process_pool().submit(batch_func, batch) for batch in batches}
+    try:
+        while pending:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+            if not done:
+                return  # Out of time
+    finally:
+        # The pool is shared, so only this call's batches are dropped
+        for future in pending:
+            future.cancel()
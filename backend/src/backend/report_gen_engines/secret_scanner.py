@@ -0,0 +1,124 @@
+import mmap
+import os
+import re
+
+from process_pool import get_process_pool
+from tree_reader import GitObjectReader
+
+
+# Bump when the scanner's findings change; cached analysis results are keyed on it
+ENGINE_VERSION = 1
+
+# Secret patterns, each with the literals that must occur for it to match at all
+SECRET_PATTERNS = [
+    ("assignment", re.compile(
+        rb"(API_KEY|SECRET_KEY|TOKEN|PASSWORD|ACCESS_KEY|PRIVATE_KEY)\s*=\s*[\'\"].+[\'\"]"),
+     (b"_KEY", b"TOKEN", b"PASSWORD")),
+    ("AWS_ACCESS_KEY_ID", re.compile(rb"\b(?:AKIA|ASIA)[0-9A-Z]{16}\b"), (b"AKIA", b"ASIA")),
+    ("PRIVATE_KEY_BLOCK", re.compile(rb"-----BEGIN (?:[A-Z]+ )?PRIVATE KEY-----"), (b"PRIVATE KEY-----",)),
+    ("GITHUB_TOKEN", re.compile(rb"\bgh[pousr]_[A-Za-z0-9]{36,}\b"), (b"ghp_", b"gho_", b"ghu_", b"ghs_", b"ghr_")),
+]
+
+# Directories whose contents are never scanned (dependencies, build output, VCS data)
+SECRET_SCAN_IGNORED_DIRS = {"node_modules", "venv", ".venv", "dist", ".git", "__pycache__"}
+
+# Bytes sniffed to tell binary files apart (same heuristic as git: a NUL byte)
+BINARY_SNIFF_BYTES = 8000
+# Files above this size are memory-mapped instead of read into memory
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+# Files handed to each worker at a time
+SCAN_BATCH_SIZE = 64
+# Below this many candidate files a process pool costs more than it saves
+PARALLEL_MIN_FILES = 200
+
+
+def _count_newlines(data, start, end):
+    """Count newlines in data[start:end] without copying more than one chunk at a time."""
+    return sum(data[offset:min(offset + MMAP_THRESHOLD_BYTES, end)].count(b"\n")
+               for offset in range(start, end, MMAP_THRESHOLD_BYTES))
+
+
+def _find_secrets(data):
+    """Yield (line, type) for every secret pattern hit in a bytes-like buffer."""
+    for name, pattern, literals in SECRET_PATTERNS:
+        # Cheap literal prefilter before running the full regex
+        if not any(data.find(literal) != -1 for literal in literals):
+            continue
+        line, position = 1, 0
+        for match in pattern.finditer(data):
+            line += _count_newlines(data, position, match.start())
+            position = match.start()
+            kind = match.group(1) if match.groups() else name
+            yield line, kind.decode("ascii") if isinstance(kind, bytes) else kind
+
+
+def scan_file(file_path):
+    """Scan one file for secrets, skipping binaries. Returns a list of (line, type)."""
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(BINARY_SNIFF_BYTES)
+            if not head or b"\x00" in head:
+                return []
+            size = os.fstat(f.fileno()).st_size
+            if size <= MMAP_THRESHOLD_BYTES:
+                return list(_find_secrets(head + f.read()))
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return list(_find_secrets(data))
+    except (OSError, ValueError):
+        return []
+
+
+def scan_blob(data):
+    """Scan file contents already in memory, skipping binaries. Returns a list of (line, type)."""
+    if not data or b"\x00" in data[:BINARY_SNIFF_BYTES]:
+        return []
+    return list(_find_secrets(data))
+
+
+def _scan_batch(root, rel_paths):
+    hits = []
+    for rel_path in rel_paths:
+        for line, kind in scan_file(os.path.join(root, rel_path)):
+            hits.append({"file": rel_path, "line": line, "type": kind})
+    return hits
+
+
+def _scan_blob_batch(root, blobs):
+    """Scan (path, blob OID) pairs, reading them through one cat-file process per batch."""
+    hits = []
+    with GitObjectReader(root) as reader:
+        for rel_path, blob_id in blobs:
+            for line, kind in scan_blob(reader.read(blob_id)):
+                hits.append({"file": rel_path, "line": line, "type": kind})
+    return hits
+
+
+def select_scan_candidates(file_index, size_limit_bytes):
+    """Pick every indexed file under the size cap outside ignored directories."""
+    return [
+        entry.path for entry in file_index.files.values()
+        if 0 < entry.size <= size_limit_bytes
+        and not any(part in SECRET_SCAN_IGNORED_DIRS for part in entry.parent.split("/"))
+    ]
+
+
+def scan_secrets(root, rel_paths, max_workers=None, blob_ids=None):
+    """Scan files for secrets, fanning out across the shared process pool for large trees.
+
+    max_workers=1 scans in this process instead. With blob_ids (path -> blob OID), files are read from the object database
+    of the repository at root instead of from its working tree.
+    """
+    scan_batch = _scan_batch
+    if blob_ids is not None:
+        scan_batch = _scan_blob_batch
+        rel_paths = [(rel_path, blob_ids[rel_path]) for rel_path in rel_paths if rel_path in blob_ids]
+    if len(rel_paths) < PARALLEL_MIN_FILES or max_workers == 1:
+        return scan_batch(root, rel_paths)
+
+    batches = [rel_paths[i:i + SCAN_BATCH_SIZE]
+               for i in range(0, len(rel_paths), SCAN_BATCH_SIZE)]
+
+    hits = []
+    for batch_hits in get_process_pool().map(scan_batch, [root] * len(batches), batches):
+        hits.extend(batch_hits)
+    return hits
@@ -0,0 +1,95 @@
+import logging
+import os
+import sqlite3
+import threading
+
+
+# Eviction frees space down to this fraction of the cap, so it does not run on every put
+EVICTION_TARGET_RATIO = 0.9
+
+
+class SQLiteLRUStore:
+    """Size-capped SQLite table whose least recently used rows are evicted first.
+
+    Subclasses name the table and its own columns; every row also gets a
+    size in bytes and a last_used time, which eviction goes by. A max_bytes
+    of 0 disables the store.
+    """
+
+    table = None
+    # Column definitions of the subclass, and the columns of a composite primary key
+    columns = ()
+    primary_key = ()
+    # Name used in log messages
+    label = "Store"
+
+    _shared_guard = threading.Lock()
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = None
+
+    @classmethod
+    def shared(cls):
+        """The instance of this class shared by the whole process, created on first use."""
+        with SQLiteLRUStore._shared_guard:
+            if cls.__dict__.get("_shared") is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _connect(self):
+        """Open the database on first use; call with self._lock held."""
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            definitions = [*self.columns, "size INTEGER NOT NULL", "last_used REAL NOT NULL"]
+            if self.primary_key:
+                definitions.append(f"PRIMARY KEY ({', '.join(self.primary_key)})")
+            self._connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ({', '.join(definitions)})")
+            self._connection.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.table}_last_used ON {self.table} (last_used)")
+        return self._connection
+
+    def _evict(self, connection):
+        """Delete the least recently used rows once the stored size exceeds max_bytes."""
+        total_size = connection.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        excess = total_size - int(self.max_bytes * EVICTION_TARGET_RATIO)
+        evicted, freed = [], 0
+        for rowid, size in connection.execute(f"SELECT rowid, size FROM {self.table} ORDER BY last_used"):
+            if freed >= excess:
+                break
+            evicted.append((rowid,))
+            freed += size
+        connection.executemany(f"DELETE FROM {self.table} WHERE rowid = ?", evicted)
+        logging.info(f"{self.label} evicted {len(evicted)} entries ({freed} bytes)")
+
+    def stats(self):
+        """Hit and miss counters of this process, plus the current size of the store."""
+        lookups = self.hits + self.misses
+        stats = {"hits": self.hits, "misses": self.misses,
+                 "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0, "entries": 0, "size_bytes": 0}
+        if self.enabled:
+            try:
+                with self._lock:
+                    stats["entries"], stats["size_bytes"] = self._connect().execute(
+                        f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+            except sqlite3.Error:
+                pass
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
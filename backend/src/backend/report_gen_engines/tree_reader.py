@@ -0,0 +1,216 @@
+import os
+import subprocess
+import threading
+
+from file_index import FileEntry, FileIndex
+
+
+def resolve_commit(directory, ref="HEAD"):
+    """Full SHA of the commit a ref points to, or None when it does not resolve."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--verify", "-q", f"{ref}^{{commit}}"], cwd=directory,
+            stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL, text=True).strip() or None
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+
+
+def _git_z(directory, *args):
+    """NUL-separated output of a git command, or None when it fails."""
+    try:
+        output = subprocess.check_output(["git", *args], cwd=directory,
+                                         stdin=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+    return [token.decode("utf-8", errors="ignore") for token in output.split(b"\x00") if token]
+
+
+def checkout_blob_ids(directory):
+    """Blob OIDs of the tracked files of a checkout whose contents match the git index.
+
+    Files modified in the working tree are left out, as are untracked files.
+    Empty when directory is not the top level of a git checkout.
+    """
+    prefix = _git_z(directory, "rev-parse", "--show-prefix")
+    if prefix is None or prefix[0].strip():
+        return {}  # Not a checkout, or a subdirectory of one
+    blob_ids = {}
+    # Each entry is "<mode> <object> <stage>\t<path>"
+    for entry in _git_z(directory, "ls-files", "-s", "-z") or []:
+        info, _, path = entry.partition("\t")
+        fields = info.split()
+        if len(fields) == 3 and fields[2] == "0" and fields[0] not in ("120000", "160000"):
+            blob_ids[path] = fields[1]
+    # Compares stat data only, so it stays cheap on large checkouts
+    for path in _git_z(directory, "diff-files", "--name-only", "-z") or []:
+        blob_ids.pop(path, None)
+    return blob_ids
+
+
+def get_blob_ids(file_index):
+    """Blob OIDs of the indexed files, used to reuse per-file results across analyses."""
+    if file_index.blob_ids is None:
+        file_index.blob_ids = checkout_blob_ids(file_index.root)
+    return file_index.blob_ids
+
+
+class GitObjectReader:
+    """Read objects through one long-lived `git cat-file --batch` process.
+
+    Safe to share between threads; requests are answered one at a time. With
+    batch_check, only object types and sizes can be looked up, which is cheaper.
+    """
+
+    def __init__(self, directory, batch_check=False):
+        self.directory = directory
+        self.batch_check = batch_check
+        self._lock = threading.Lock()
+        self._process = subprocess.Popen(
+            ["git", "cat-file", "--batch-check" if batch_check else "--batch"], cwd=directory,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def _request(self, obj):
+        """Send one object name and return its (type, size), or None when it is missing."""
+        if self._process.poll() is not None:
+            return None
+        self._process.stdin.write(obj.encode("utf-8") + b"\n")
+        self._process.stdin.flush()
+        # "<oid> <type> <size>" or "<object> missing"
+        header = self._process.stdout.readline().split()
+        if len(header) != 3 or not header[2].isdigit():
+            return None
+        return header[1].decode("ascii"), int(header[2])
+
+    def _read_contents(self, size):
+        data = self._process.stdout.read(size)
+        self._process.stdout.read(1)  # Trailing newline
+        return data
+
+    def read(self, obj):
+        """Contents of an object (an OID or "<rev>:<path>"), or None when it is missing."""
+        if self.batch_check:
+            raise ValueError("Object contents cannot be read in batch_check mode")
+        with self._lock:
+            info = self._request(obj)
+            return self._read_contents(info[1]) if info else None
+
+    def info(self, obj):
+        """(type, size) of an object, or None when it is missing."""
+        with self._lock:
+            info = self._request(obj)
+            if info and not self.batch_check:
+                self._read_contents(info[1])
+            return info
+
+    def close(self):
+        with self._lock:
+            if self._process.poll() is None:
+                self._process.stdin.close()
+                self._process.wait()
+            self._process.stdout.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_file_contents(root, items, from_git):
+    """Yield (path, bytes or None) for (path, blob OID or None) items, read from git or from the checkout."""
+    reader = GitObjectReader(root) if from_git else None
+    try:
+        for rel_path, blob_id in items:
+            if reader:
+                data = reader.read(blob_id) if blob_id else None
+            else:
+                try:
+                    with open(os.path.join(root, rel_path), "rb") as f:
+                        data = f.read()
+                except OSError:
+                    data = None
+            yield rel_path, data
+    finally:
+        if reader:
+            reader.close()
+
+
+class TreeIndex(FileIndex):
+    """FileIndex of a commit's tree, read from the object database instead of a checkout."""
+
+    def __init__(self, root, commit, reader=None):
+        super().__init__(root)
+        self.commit = commit
+        # Relative path -> blob OID
+        self.blob_ids = {}
+        self._reader = reader
+        self._owns_reader = reader is None
+
+    def read_bytes(self, rel_path):
+        blob_id = self.blob_ids.get(rel_path)
+        if blob_id is None:
+            return None
+        if self._reader is None:
+            self._reader = GitObjectReader(self.root)
+        return self._reader.read(blob_id)
+
+    def close(self):
+        """Stop the cat-file process, unless it was handed in by the caller."""
+        if self._owns_reader and self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+def _add_directory(index, rel_dir):
+    """Register a directory and its parents, in top-down order."""
+    if rel_dir in index.directories:
+        return
+    parent, name = rel_dir.rsplit("/", 1) if "/" in rel_dir else ("", rel_dir)
+    _add_directory(index, parent)
+    index.directories[rel_dir] = ([], [])
+    index.directories[parent][0].append(name)
+
+
+def build_tree_index(directory, ref="HEAD", subdirs=None, reader=None):
+    """Index the tree of a ref without checking it out. Returns None if the ref is unknown.
+
+    With subdirs, only those top-level directories are indexed. Several refs can
+    be indexed and read concurrently from the same repository, bare or not.
+    """
+    commit = resolve_commit(directory, ref)
+    if commit is None:
+        return None
+    index = TreeIndex(directory, commit, reader)
+    selected = set(subdirs) if subdirs else None
+    index.directories[""] = ([], [])
+
+    command = ["git", "ls-tree", "-r", "-t", "-l", "-z", "--full-tree", commit]
+    try:
+        output = subprocess.check_output(command, cwd=directory, stdin=subprocess.DEVNULL,
+                                         stderr=subprocess.DEVNULL)
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return index
+
+    for token in output.split(b"\x00"):
+        # Each entry is "<mode> <type> <object> <size>\t<path>"
+        info, _, path = token.decode("utf-8", errors="ignore").partition("\t")
+        fields = info.split()
+        if len(fields) != 4 or not path:
+            continue
+        if selected is not None and path.split("/", 1)[0] not in selected:
+            continue
+        mode, obj_type, obj_id, size = fields
+        parent, name = path.rsplit("/", 1) if "/" in path else ("", path)
+        _add_directory(index, parent)
+        if obj_type == "tree":
+            _add_directory(index, path)
+        elif obj_type == "commit":
+            index.directories[parent][0].append(name)  # Submodule: listed, never descended
+        else:
+            index.directories[parent][1].append(name)
+            index.files[path] = FileEntry(
+                path, int(size) if size.isdigit() else 0, os.path.splitext(name)[1], parent)
+            if mode != "120000":  # Symlink targets are not file contents
+                index.blob_ids[path] = obj_id
+
+    return index
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+# Tokens of repository data in each section research prompt
+ANALYSIS_TOKEN_BUDGET = int(os.getenv("ANALYSIS_TOKEN_BUDGET", "1500"))
+# Tokens of the overview given to the reporting analyst, who gets the details from the research
+OVERVIEW_TOKEN_BUDGET = int(os.getenv("OVERVIEW_TOKEN_BUDGET", "200"))
+
+# Report sections researched separately, each with the parts of analyze_folder's output it
+# covers, most relevant first (the last ones are dropped first); every part goes to one section
+RESEARCH_SECTIONS = {
+    "architecture": ["project_architecture", "total_files", "total_folders", "code_quality"],
+    "languages_frameworks": ["language_usage", "frameworks"],
+    "commit_activity": ["git_info"],
+    "security": ["security_info", "dependency_security"],
+    "documentation": ["documentation"],
+}
+# Sections repeated in the reporting analyst's overview
+OVERVIEW_SECTIONS = ["project_architecture", "frameworks", "language_usage", "total_files", "total_folders"]
+
+# Items kept per list or dict, tried in turn until the data fits its budget
+ITEM_LIMITS = (50, 20, 10, 5, 3, 1)
+# Characters kept per string value
+STRING_LIMIT = 300
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Tokens of a prompt fragment: exact for tiktoken's encoding, about 4 characters per token without it."""
+    global _encoding
+    if _encoding is None:
+        _encoding = False
+        if tiktoken is not None:
+            try:
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                # The encoding is downloaded on first use, which fails on offline machines
+                logging.warning(f"Falling back to estimated token counts: {e}")
+    if not _encoding:
+        return (len(text) + 3) // 4
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+def _truncate(value, item_limit):
+    if isinstance(value, dict):
+        items = list(value.items())
+        truncated = {key: _truncate(item, item_limit) for key, item in items[:item_limit]}
+        if len(items) > item_limit:
+            truncated["..."] = f"{len(items) - item_limit} more"
+        return truncated
+    if isinstance(value, list):
+        truncated = [_truncate(item, item_limit) for item in value[:item_limit]]
+        if len(value) > item_limit:
+            truncated.append(f"... {len(value) - item_limit} more")
+        return truncated
+    if isinstance(value, str) and len(value) > STRING_LIMIT:
+        return value[:STRING_LIMIT] + "..."
+    return value
+
+
+def _render(sections, item_limit):
+    compacted = {name: _truncate(value, item_limit) for name, value in sections}
+    return json.dumps(compacted, separators=(",", ":"), ensure_ascii=False)
+
+
+def compact_analysis(analysis_data, budget, section_names):
+    """Minified JSON of the given parts of the analysis within a token budget.
+
+    Lists and dicts are cut to fewer items until the data fits; if even one
+    item each is too much, the least relevant parts are dropped.
+    """
+    sections = [(name, analysis_data[name]) for name in section_names
+                if name in analysis_data and analysis_data[name] not in (None, "", [], {})]
+
+    for item_limit in ITEM_LIMITS:
+        text = _render(sections, item_limit)
+        if count_tokens(text) <= budget:
+            return text
+    while len(sections) > 1 and count_tokens(text) > budget:
+        sections.pop()
+        text = _render(sections, ITEM_LIMITS[-1])
+    return text
+
+
+def prepare_crew_inputs(analysis_data, budget=ANALYSIS_TOKEN_BUDGET, overview_budget=OVERVIEW_TOKEN_BUDGET):
+    """Prompt inputs carrying each part of the analysis once: "<section>_data" for the research
+    task of its section, plus a short overview for the reporting analyst."""
+    inputs = {f"{section}_data": compact_analysis(analysis_data, budget, names)
+              for section, names in RESEARCH_SECTIONS.items()}
+    inputs["git_overview"] = compact_analysis(analysis_data, overview_budget, OVERVIEW_SECTIONS)
+
+    # Both agents used to get the raw analysis, formatted as a Python dict
+    raw_tokens = count_tokens(str(analysis_data))
+    token_counts = {name: count_tokens(text) for name, text in inputs.items()}
+    logging.info(
+        f"Crew prompt data: {2 * raw_tokens} tokens before compaction ({raw_tokens} per agent), "
+        f"{sum(token_counts.values())} after {token_counts} (budgets {budget}/{overview_budget})")
+    return inputs
@@ -3,6 +3,14 @@ from crewai.project import CrewBase, agent, crew, task
 from crewai import Agent, Crew, Process, Task, LLM
 from crewai.project import CrewBase, agent, crew, task, before_kickoff, after_kickoff
 from crewai_tools import SerperDevTool
+import os
+
+from research_crew.gateway import PRIORITY_BATCH
+from research_crew.llm_cache import CachedLLM
+
+# Model served by the local model server, as a litellm model name (provider/model)
+LLM_MODEL = os.getenv("LLM_MODEL", "ollama/llama3.2:latest")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "http://localhost:11434")
 
 # If you want to run a snippet of code before or after the crew starts,
 # you can use the @before_kickoff and @after_kickoff decorators
@@ -22,34 +30,60 @@ class ResearchCrew():
     # If you would like to add tools to your agents, you can learn more about it here:
     # https://docs.crewai.com/concepts/agents#agent-tools
 
-    # LLM Object from crewai package
-    llm = LLM(model="llama3.2:latest", base_url="http://localhost:11434")
+    def __init__(self, priority=PRIORITY_BATCH):
+        # LLM Object from crewai package, answering repeated prompts from the response cache and
+        # sending the others through the shared gateway, which pools connections to the model
+        # server and queues requests by priority; tokens are streamed as they are generated,
+        # so the report can be shown while it is written
+        self.llm = CachedLLM(model=LLM_MODEL, base_url=LLM_BASE_URL, stream=True, priority=priority)
 
-    @agent
-    def senior_git_data_researcher(self) -> Agent:
+    def section_researcher(self) -> Agent:
+        # A new researcher per section: an agent runs one task at a time
         return Agent(
             config=self.agents_config['senior_git_data_researcher'],
+            llm=self.llm,
             verbose=True
-
-
         )
 
     @agent
     def git_reporting_analyst(self) -> Agent:
         return Agent(
             config=self.agents_config['git_reporting_analyst'],
+            llm=self.llm,
             verbose=True
         )
 
     # To learn more about structured task outputs,
     # task dependencies, and task callbacks, check out the documentation:
     # https://docs.crewai.com/concepts/tasks#overview-of-a-task
-    @task
-    def git_research_task(self) -> Task:
+    def section_research_task(self, section) -> Task:
+        # Runs alongside the other sections; the reporting task waits for all of them
         return Task(
-            config=self.tasks_config['git_research_task'],
+            config=self.tasks_config[f'{section}_research_task'],
+            agent=self.section_researcher(),
+            async_execution=True
         )
 
+    @task
+    def architecture_research_task(self) -> Task:
+        return self.section_research_task('architecture')
+
+    @task
+    def languages_frameworks_research_task(self) -> Task:
+        return self.section_research_task('languages_frameworks')
+
+    @task
+    def commit_activity_research_task(self) -> Task:
+        return self.section_research_task('commit_activity')
+
+    @task
+    def security_research_task(self) -> Task:
+        return self.section_research_task('security')
+
+    @task
+    def documentation_research_task(self) -> Task:
+        return self.section_research_task('documentation')
+
     @task
     def git_reporting_task(self) -> Task:
         return Task(
@@ -64,10 +98,12 @@ class ResearchCrew():
         # https://docs.crewai.com/concepts/knowledge#what-is-knowledge
 
         return Crew(
-            agents=self.agents,  # Automatically created by the @agent decorator
+            # The section researchers are not @agent methods, so take every task's agent
+            agents=list({id(task.agent): task.agent for task in self.tasks}.values()),
             tasks=self.tasks,  # Automatically created by the @task decorator
             process=Process.sequential,
-            verbose=True,
+            # The crew's console tree follows one task at a time and breaks on the concurrent sections
+            verbose=False,
             memory=False,
             # process=Process.hierarchical, # In case you wanna use that instead https://docs.crewai.com/how-to/Hierarchical/
         )
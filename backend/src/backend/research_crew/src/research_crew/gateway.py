@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+
+import httpx
+import litellm
+import openai
+from crewai import LLM
+from crewai.utilities.events import crewai_event_bus
+from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+from research_crew.compaction import count_tokens
+
+
+# Model requests running at once across every crew of this process; match the parallel
+# requests the model server handles (OLLAMA_NUM_PARALLEL), the rest wait in the queue
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "2"))
+# Seconds one model request may take, streaming included
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "300"))
+# Attempts after a failed request, for errors that may pass (timeouts, connection errors, 5xx, 429)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+# Base of the exponential backoff between attempts; each wait is a random part of it
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "1"))
+# Idle pooled connections are closed after this long
+LLM_KEEPALIVE_SECONDS = 60
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0  # Someone is waiting on the result, e.g. a report streamed to the UI
+PRIORITY_BATCH = 10  # Reports generated in the background or from the command line
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+# Completed requests kept for the metrics
+METRICS_WINDOW = 500
+RETRYABLE_ERRORS = (
+    litellm.Timeout, litellm.APIConnectionError, litellm.RateLimitError, litellm.ServiceUnavailableError,
+    litellm.InternalServerError, httpx.TimeoutException, httpx.TransportError,
+)
+
+# litellm's callbacks are global lists that every call rewrites
+_callbacks_lock = threading.Lock()
+# Stream chunks emitted on each thread; crewai emits them on the thread making the request
+_streamed = threading.local()
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _count_stream_chunk(source, event):
+    _streamed.chunks = getattr(_streamed, "chunks", 0) + 1
+
+
+def _is_retryable(error):
+    # crewai re-raises streaming errors as plain exceptions, the original is in the chain
+    while error is not None:
+        if isinstance(error, RETRYABLE_ERRORS):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class LLMGateway:
+    """Admission, connection pooling, retries and metrics for every model request of the process.
+
+    Requests beyond `max_in_flight` wait in a queue ordered by priority,
+    then arrival, so interactive work overtakes batch work without
+    overloading the model server.
+    """
+
+    def __init__(self, max_in_flight=LLM_MAX_IN_FLIGHT, timeout=LLM_REQUEST_TIMEOUT_SECONDS,
+                 max_retries=LLM_MAX_RETRIES, retry_base_seconds=LLM_RETRY_BASE_SECONDS):
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.in_flight = 0
+        self._waiting = []  # Heap of (priority, arrival, ticket)
+        self._arrivals = itertools.count()
+        self._condition = threading.Condition()
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+        self._metrics = deque(maxlen=METRICS_WINDOW)
+        self._metrics_lock = threading.Lock()
+
+    def _acquire(self, priority):
+        ticket = (priority, next(self._arrivals), object())
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while self._waiting[0] is not ticket or self.in_flight >= self.max_in_flight:
+                    self._condition.wait()
+            except BaseException:
+                # Interrupted while waiting: leave the queue so the next request is not stuck behind
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self.in_flight += 1
+            # The next waiter may fit as well
+            self._condition.notify_all()
+
+    def _release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    def pooled_client(self, model, base_url):
+        """Keep-alive HTTP client shared by every LLM of a model server, for litellm's `client` parameter.
+
+        Only providers whose litellm client can be passed in are pooled here;
+        for the others litellm keeps a client of its own.
+        """
+        provider = model.split("/", 1)[0]
+        if provider not in ("ollama", "openai"):
+            return None
+        with self._clients_lock:
+            key = (provider, base_url)
+            if key not in self._clients:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=self.max_in_flight,
+                                        max_keepalive_connections=self.max_in_flight,
+                                        keepalive_expiry=LLM_KEEPALIVE_SECONDS),
+                    timeout=httpx.Timeout(self.timeout, connect=5.0))
+                if provider == "ollama":
+                    self._clients[key] = HTTPHandler(timeout=self.timeout, client=http_client)
+                else:
+                    # Retries are the gateway's, so the client does not add its own
+                    self._clients[key] = openai.OpenAI(
+                        base_url=base_url, api_key=os.getenv("OPENAI_API_KEY", "none"),
+                        http_client=http_client, max_retries=0)
+            return self._clients[key]
+
+    def execute(self, request, priority=PRIORITY_BATCH):
+        """Run request() once admitted, retrying transient failures with jittered backoff.
+
+        A streaming request that fails after emitting chunks is not retried:
+        the retry would stream its answer again after the part already shown.
+        """
+        queued_at = time.monotonic()
+        self._acquire(priority)
+        started_at = time.monotonic()
+        attempts = 0
+        try:
+            while True:
+                attempts += 1
+                chunks_before = getattr(_streamed, "chunks", 0)
+                try:
+                    response = request()
+                    break
+                except Exception as e:
+                    streamed = getattr(_streamed, "chunks", 0) != chunks_before
+                    if streamed or attempts > self.max_retries or not _is_retryable(e):
+                        self._record(priority, queued_at, started_at, attempts, None)
+                        raise
+                    delay = random.uniform(0, self.retry_base_seconds * 2 ** (attempts - 1))
+                    logging.warning(f"LLM request failed ({e}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+        finally:
+            self._release()
+        self._record(priority, queued_at, started_at, attempts, response)
+        return response
+
+    def _record(self, priority, queued_at, started_at, attempts, response):
+        latency = time.monotonic() - started_at
+        tokens = count_tokens(response) if isinstance(response, str) else 0
+        metric = {
+            "priority": PRIORITY_NAMES.get(priority, str(priority)),
+            "queued_seconds": round(started_at - queued_at, 3),
+            "latency_seconds": round(latency, 3),
+            "output_tokens": tokens,
+            "tokens_per_second": round(tokens / latency, 1) if latency > 0 else 0.0,
+            "attempts": attempts,
+            "ok": response is not None,
+        }
+        with self._metrics_lock:
+            self._metrics.append(metric)
+        logging.info(f"LLM request ({metric['priority']}): queued {metric['queued_seconds']}s, "
+                     f"{metric['latency_seconds']}s, {metric['tokens_per_second']} tokens/s, "
+                     f"{attempts} attempt(s){'' if metric['ok'] else ', failed'}")
+
+    def stats(self):
+        """Summary of the recent requests, per priority."""
+        with self._metrics_lock:
+            metrics = list(self._metrics)
+        summary = {"in_flight": self.in_flight, "waiting": len(self._waiting)}
+        for name in sorted({metric["priority"] for metric in metrics}):
+            group = [metric for metric in metrics if metric["priority"] == name]
+            latencies = sorted(metric["latency_seconds"] for metric in group)
+            summary[name] = {
+                "requests": len(group),
+                "failures": sum(not metric["ok"] for metric in group),
+                "retries": sum(metric["attempts"] - 1 for metric in group),
+                "mean_queued_seconds": round(statistics.mean(metric["queued_seconds"] for metric in group), 3),
+                "p50_latency_seconds": latencies[len(latencies) // 2],
+                "p95_latency_seconds": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+                "mean_tokens_per_second": round(statistics.mean(
+                    metric["tokens_per_second"] for metric in group), 1),
+            }
+        return summary
+
+
+_llm_gateway = None
+_llm_gateway_guard = threading.Lock()
+
+
+def get_llm_gateway():
+    """The gateway shared by every LLM of this process."""
+    global _llm_gateway
+    with _llm_gateway_guard:
+        if _llm_gateway is None:
+            _llm_gateway = LLMGateway()
+        return _llm_gateway
+
+
+class GatewayLLM(LLM):
+    """crewai LLM sending its requests through the process-wide gateway, at a given priority."""
+
+    def __init__(self, *args, gateway=None, priority=PRIORITY_BATCH, **kwargs):
+        gateway = gateway or get_llm_gateway()
+        kwargs.setdefault("timeout", gateway.timeout)
+        client = gateway.pooled_client(kwargs.get("model", args[0] if args else ""), kwargs.get("base_url"))
+        if client is not None:
+            kwargs["client"] = client
+        super().__init__(*args, **kwargs)
+        self.gateway = gateway
+        self.priority = priority
+
+    def set_callbacks(self, callbacks):
+        with _callbacks_lock:
+            super().set_callbacks(callbacks)
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        return self.gateway.execute(
+            lambda: super(GatewayLLM, self).call(messages, tools, callbacks, available_functions),
+            self.priority)
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from crewai.utilities.events import crewai_event_bus
+from crewai.utilities.events.llm_events import LLMCallStartedEvent, LLMCallType, LLMStreamChunkEvent
+
+from backend.report_gen_engines.sqlite_lru import SQLiteLRUStore
+from research_crew.gateway import GatewayLLM
+
+
+# Completed LLM responses, shared by every crew run on this machine
+LLM_CACHE_PATH = os.path.abspath(os.getenv("LLM_CACHE_PATH", "./analysis_cache/llm_responses.sqlite3"))
+# Responses older than this are generated again
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Size cap of the stored responses; 0 disables the cache
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Skip lookups (responses are still stored), e.g. to force a fresh report
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+# Parameters that change what the model generates
+SAMPLING_PARAMETERS = (
+    "temperature", "top_p", "n", "stop", "max_tokens", "max_completion_tokens", "presence_penalty",
+    "frequency_penalty", "logit_bias", "seed", "logprobs", "top_logprobs", "reasoning_effort",
+)
+
+
+class LLMResponseCache(SQLiteLRUStore):
+    """On-disk store of LLM responses keyed by a hash of model, prompt and sampling parameters."""
+
+    table = "llm_responses"
+    columns = ("key TEXT PRIMARY KEY", "model TEXT NOT NULL", "response TEXT NOT NULL", "created_at REAL NOT NULL")
+    label = "LLM cache"
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl_seconds=LLM_CACHE_TTL_SECONDS, max_bytes=LLM_CACHE_MAX_BYTES):
+        super().__init__(path, max_bytes)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        """Stored response of a key, or None when missing or expired."""
+        if not self.enabled:
+            return None
+        try:
+            with self._lock:
+                connection = self._connect()
+                row = connection.execute(
+                    "SELECT response FROM llm_responses WHERE key = ? AND created_at >= ?",
+                    (key, time.time() - self.ttl_seconds)).fetchone()
+                if row:
+                    connection.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                    connection.commit()
+                    self.hits += 1
+                    return row[0]
+                self.misses += 1
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache lookup failed: {e}")
+        return None
+
+    def put(self, key, model, response):
+        """Store a response, then drop expired entries and the least recently used ones beyond the cap."""
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                connection = self._connect()
+                connection.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, model, response, size, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", (key, model, response, len(response.encode("utf-8")), now, now))
+                connection.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+                self._evict(connection)
+                connection.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"LLM cache update failed: {e}")
+
+
+def get_llm_cache():
+    """The cache shared by every LLM of this process."""
+    return LLMResponseCache.shared()
+
+
+def response_cache_key(model, messages, params):
+    """Hash of everything that determines a response: model, rendered messages and sampling parameters."""
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    payload = {
+        "model": model,
+        "messages": messages,
+        "params": {name: params[name] for name in SAMPLING_PARAMETERS if params.get(name) not in (None, [])},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class CachedLLM(GatewayLLM):
+    """Gateway LLM answering repeated prompts from the response cache.
+
+    Only misses go through the gateway. Calls with tools are always sent
+    to the model, since their result depends on running the tools.
+    """
+
+    def __init__(self, *args, cache=None, bypass_cache=LLM_CACHE_BYPASS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache or get_llm_cache()
+        self.bypass_cache = bypass_cache
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        if tools or available_functions or not self.cache.enabled:
+            return super().call(messages, tools, callbacks, available_functions)
+
+        key = response_cache_key(self.model, messages, vars(self))
+        if not self.bypass_cache:
+            response = self.cache.get(key)
+            if response is not None:
+                # Listeners pair every completed call with a started one
+                crewai_event_bus.emit(self, event=LLMCallStartedEvent(
+                    messages=messages, tools=tools, callbacks=callbacks, available_functions=available_functions))
+                if self.stream:
+                    # Stream listeners get the cached response as a single chunk
+                    crewai_event_bus.emit(self, event=LLMStreamChunkEvent(chunk=response))
+                self._handle_emit_call_events(response, LLMCallType.LLM_CALL)
+                return response
+
+        response = super().call(messages, tools, callbacks, available_functions)
+        if isinstance(response, str) and response.strip():
+            self.cache.put(key, self.model, response)
+        return response
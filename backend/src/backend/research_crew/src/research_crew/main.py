@@ -4,12 +4,31 @@ import warnings
 
 from datetime import datetime
 from research_crew.crew import ResearchCrew
+from research_crew.compaction import prepare_crew_inputs
+from research_crew.gateway import get_llm_gateway
+from research_crew.llm_cache import get_llm_cache
 import json
 import os
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
-from backend.report_gen_engines.language_engine import analyze_folder
+from backend.report_gen_engines.language_engine import GIT_SCRAP_FILE, analyze_folder
+
+# Written by analyze_folder
+ANALYSIS_RESULT_FILE = GIT_SCRAP_FILE
+
+def build_inputs(analysis_data, project_description=""):
+    """Crew inputs for the output of analyze_folder, with the description the user gave of the project."""
+    # Compact the analysis to the prompt budget instead of pasting it whole into both agents
+    return {
+        'topic': 'Git repository Summary',
+        **prepare_crew_inputs(analysis_data),
+        'project_description': project_description.strip() or 'No description given.',
+        # Day resolution, so the prompts of a regenerated report match the cached ones
+        'current_date': datetime.now().strftime('%Y-%m-%d'),
+        'current_year': str(datetime.now().year)
+    }
+
 
 def run():
     """
@@ -22,17 +41,14 @@ def run():
             print("Successfully loaded analysis data!")
     else:
         print(f"Error: {ANALYSIS_RESULT_FILE} not found")
-
-    inputs = {
-        'topic': 'Git repository Summary',
-        'git_scraped_data': analysis_data,
-        'current_date': str(datetime.now())
-    }
+        return
 
     try:
-        ResearchCrew().crew().kickoff(inputs=inputs)
+        ResearchCrew().crew().kickoff(inputs=build_inputs(analysis_data))
     except Exception as e:
         raise Exception(f"An error occurred while running the crew: {e}")
+    print(f"LLM response cache: {get_llm_cache().stats()}")
+    print(f"LLM gateway: {get_llm_gateway().stats()}")
 
 
 def train():
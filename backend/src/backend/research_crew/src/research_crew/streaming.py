@@ -0,0 +1,136 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from crewai.utilities.events import crewai_event_bus
+from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+from crewai.utilities.events.task_events import TaskCompletedEvent, TaskStartedEvent
+
+from research_crew.crew import ResearchCrew
+from research_crew.gateway import PRIORITY_INTERACTIVE
+from research_crew.main import build_inputs
+
+
+# Seconds without events after which a keep-alive is sent, so idle connections stay open
+KEEPALIVE_SECONDS = 15
+# Finished runs kept for clients that reconnect; the oldest finished ones are dropped first
+REPORT_RUNS_KEPT = 32
+
+# crewai's event bus is process-wide: task events are routed to their run through the task,
+# stream chunks through the run and task last started on the thread emitting them
+_task_runs = {}
+_current_task = threading.local()
+
+_runs = OrderedDict()
+_runs_guard = threading.Lock()
+
+
+class ReportRun:
+    """One crew run writing a report, with every event it produced so far.
+
+    Clients read the events from the start, so one that reconnects (e.g.
+    after a Streamlit rerun) catches up instead of starting another run.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.events = []
+        self.finished = False
+        self.failed = False
+        self._condition = threading.Condition()
+
+    def publish(self, event):
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+
+    def finish(self, failed):
+        with self._condition:
+            self.finished = True
+            self.failed = failed
+            self._condition.notify_all()
+
+    def follow(self):
+        """Yield the events from the first one, then new ones as they come, until the run ends."""
+        position = 0
+        while True:
+            with self._condition:
+                if position == len(self.events) and not self.finished:
+                    self._condition.wait(timeout=KEEPALIVE_SECONDS)
+                events = self.events[position:]
+                finished = self.finished
+            position += len(events)
+            if not events and not finished:
+                yield {"event": "keepalive"}
+            yield from events
+            if finished and position == len(self.events):
+                return
+
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _on_task_started(source, event):
+    # Each task runs on one thread, the crew's own or one of its async task threads
+    _current_task.run = _task_runs.get(id(source))
+    _current_task.name = source.name
+    if _current_task.run is not None:
+        _current_task.run.publish({"event": "task_started", "task": source.name})
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _on_stream_chunk(source, event):
+    run = getattr(_current_task, "run", None)
+    if run is not None:
+        run.publish({"event": "token", "task": _current_task.name, "text": event.chunk})
+
+
+@crewai_event_bus.on(TaskCompletedEvent)
+def _on_task_completed(source, event):
+    run = _task_runs.get(id(source))
+    if run is not None:
+        run.publish({"event": "task_completed", "task": source.name, "output": event.output.raw})
+
+
+def _kickoff(run, analysis_data, project_description):
+    # Someone is watching this report being written, so its requests go first
+    crew = ResearchCrew(priority=PRIORITY_INTERACTIVE).crew()
+    for task in crew.tasks:
+        _task_runs[id(task)] = run
+    failed = True
+    try:
+        result = crew.kickoff(inputs=build_inputs(analysis_data, project_description))
+        run.publish({"event": "report", "output": result.raw})
+        failed = False
+    except Exception as e:
+        logging.exception("Streamed crew run failed")
+        run.publish({"event": "error", "error": str(e)})
+    finally:
+        for task in crew.tasks:
+            _task_runs.pop(id(task), None)
+        run.finish(failed)
+
+
+def stream_report(key, analysis_data, retry=False, project_description=""):
+    """Yield the events of the crew run writing the report of an analysis.
+
+    key identifies the analysis (e.g. its job ID): the crew runs once per
+    key and project description, and every client of those, including ones
+    that reconnect, gets the run's events from the start. With retry, a failed run is started
+    again; a finished one is only replayed.
+
+    Runs of different keys stream at the same time; the gateway orders their
+    model requests. Events are dicts: "token" (generated text of a task),
+    "task_started", "task_completed", then "report" with the final report or
+    "error"; "keepalive" while nothing happens.
+    """
+    key = (key, project_description.strip())
+    with _runs_guard:
+        run = _runs.get(key)
+        if run is None or (retry and run.failed):
+            run = _runs[key] = ReportRun(key)
+            threading.Thread(target=_kickoff, args=(run, analysis_data, project_description),
+                             name="report-crew", daemon=True).start()
+        _runs.move_to_end(key)
+        finished_keys = [old_key for old_key, old_run in _runs.items() if old_run.finished]
+        for old_key in finished_keys[:max(0, len(_runs) - REPORT_RUNS_KEPT)]:
+            del _runs[old_key]
+    yield from run.follow()
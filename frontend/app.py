@@ -1,24 +1,57 @@
-from backend.handlers.zip_handler import zipper
 from backend.handlers.subdir_handler import list_subdirectories
-from backend.handlers.repo_handler import clone_repository, get_branches, checkout_branch
+from backend.handlers.mirror_handler import ensure_mirror, get_commit_sha, get_mirror_branches, get_mirror_path, \
+    get_worktree_id, add_worktree, remove_worktree, MIRROR_MODES
 import atexit
+import json
 import os
 import requests
 import sys
+import time
+from urllib.parse import urlencode
 import streamlit as st
 import shutil  # To remove the cloned repo directory
 import stat  # To modify file permissions
 
 st.set_page_config(page_title="Multi-Agent Code Analysis", page_icon="🔍")
 
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# Task of the research crew writing the final report; the other tasks research one section each
+REPORT_TASK = "git_reporting_task"
+# Seconds between redraws of streamed text: rendering the markdown on every token is slow
+STREAM_REDRAW_SECONDS = 0.2
+# Seconds between progress checks of a running analysis; only the progress panel reruns
+ANALYSIS_POLL_SECONDS = 2
+# (connect, read) timeouts of backend calls, so a stuck backend cannot freeze the page
+REQUEST_TIMEOUT = (5, 30)
+JOB_FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
 # Initialize session state before calling any function
 if "alerts" not in st.session_state:
     st.session_state.alerts = {"repo": [],
                                "branch": [], "subdirs": [], "analysis": []}
 
+@st.cache_resource
+def load_css(path):
+    """Read a stylesheet once per server process instead of on every rerun."""
+    with open(path, "r") as css_file:
+        return css_file.read()
+
+
+# Branches and subdirectories only change with the commit, so they are cached by its SHA; the
+# SHA arguments are part of the cache key only, and the TTL bounds branches added without HEAD moving
+@st.cache_data(ttl=300, show_spinner=False)
+def cached_branches(repo_url, head_sha):
+    return get_mirror_branches(repo_url)
+
+
+@st.cache_data(show_spinner=False)
+def cached_subdirectories(repo_url, commit_sha, _path):
+    # Worktrees of one commit hold the same files, whichever session's path is listed
+    return list_subdirectories(_path)
+
+
 # Load CSS
-with open("frontend/style.css", "r") as css_file:
-    st.markdown(f"<style>{css_file.read()}</style>", unsafe_allow_html=True)
+st.markdown(f"<style>{load_css('frontend/style.css')}</style>", unsafe_allow_html=True)
 
 # Session state initialization
 if "current_step" not in st.session_state:
@@ -40,7 +73,21 @@ if "subdirs_fetched" not in st.session_state:
 if "zip_ready" not in st.session_state:
     st.session_state.zip_ready = False
 if "repo_path" not in st.session_state:
-    st.session_state.repo_path = "./repo_clone"
+    st.session_state.repo_path = ""
+if "repo_url" not in st.session_state:
+    st.session_state.repo_url = ""
+if "analysis_job_id" not in st.session_state:
+    st.session_state.analysis_job_id = None
+if "analysis_job" not in st.session_state:
+    st.session_state.analysis_job = None  # Last polled status of the analysis job
+if "analysis_results" not in st.session_state:
+    st.session_state.analysis_results = {}  # Detector results received so far
+if "report" not in st.session_state:
+    st.session_state.report = None
+if "report_error" not in st.session_state:
+    st.session_state.report_error = None  # Why the last report run failed; cleared by a retry
+if "project_description" not in st.session_state:
+    st.session_state.project_description = ""  # As submitted with the analysis, for the report
 
 local_path = st.session_state.repo_path
 
@@ -86,17 +133,148 @@ def make_writable(path):
 
 
 def cleanup_repo():
-    """Delete the cloned repository directory after session ends"""
+    """Delete this session's worktree after session ends; the shared mirror is kept"""
     repo_path = st.session_state.get("repo_path", "")
 
-    if os.path.exists(repo_path):
-        try:
-            print(f"DEBUG: Deleting repo at {repo_path}")  # Debugging line
-            make_writable(repo_path)  # Ensure write permissions
-            shutil.rmtree(repo_path)  # Delete the entire repo folder
-            print(f"✅ Cleanup completed: {repo_path} deleted.")
-        except Exception as e:
-            print(f"❌ Error during repo cleanup: {e}")
+    if repo_path and os.path.exists(repo_path):
+        print(remove_worktree(st.session_state.get("repo_url", ""), repo_path))
+        st.session_state.repo_path = ""
+
+
+def iter_sse(response):
+    """Yield the JSON payloads of a server-sent events response as they arrive."""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data: "):
+            yield json.loads(line[len("data: "):])
+
+
+def task_text(text):
+    """The answer part of a task's streamed output; agents reason before 'Final Answer:'."""
+    return text.split("Final Answer:", 1)[-1].strip()
+
+
+def submit_analysis(project_description):
+    """Queue the analysis of the selected subdirectories; the backend runs it in the background."""
+    try:
+        response = requests.post(f"{BACKEND_URL}/analyze", json={
+            "worktree": get_worktree_id(local_path),
+            "repo_url": st.session_state.repo_url,
+            "selected_subdirs": sorted(st.session_state.selected_subdirs),
+        }, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 429:
+            add_alert("analysis", "⚠️ The analysis queue is full, please retry in a moment.", "warning")
+            return
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        add_alert("analysis", f"❌ Failed to connect to backend: {e}", "error")
+        return
+    st.session_state.analysis_job_id = response.json()["job_id"]
+    st.session_state.analysis_job = None
+    st.session_state.analysis_results = {}
+    st.session_state.report = None
+    st.session_state.report_error = None
+    # Kept apart from the text area, so editing it does not change the report being written
+    st.session_state.project_description = project_description.strip()
+    add_alert("analysis", "🔍 Analysis started!", "success")
+
+
+def poll_analysis():
+    """Refresh the job status, and the detector results when more of them are done."""
+    job_id = st.session_state.analysis_job_id
+    previous = st.session_state.analysis_job
+    response = requests.get(f"{BACKEND_URL}/analyze/{job_id}", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    job = response.json()
+    if previous is None or (job["status"], job["progress"]) != (previous["status"], previous["progress"]):
+        if job["status"] in ("queued", "running"):
+            response = requests.get(f"{BACKEND_URL}/analyze/{job_id}/result", params={"partial": True},
+                                    timeout=REQUEST_TIMEOUT)
+        elif job["status"] == "succeeded":
+            response = requests.get(f"{BACKEND_URL}/analyze/{job_id}/result", timeout=REQUEST_TIMEOUT)
+        else:
+            response = None
+        if response is not None:
+            response.raise_for_status()
+            st.session_state.analysis_results = response.json()
+    st.session_state.analysis_job = job
+    return job
+
+
+def render_analysis_results(results):
+    """One expander per detector, in the order they finished."""
+    for name, result in results.items():
+        if name == "stage_timings":
+            continue
+        with st.expander(f"📄 {name.replace('_', ' ').title()}"):
+            if isinstance(result, (dict, list)):
+                st.json(result, expanded=False)
+            else:
+                st.write(result)
+
+
+def analysis_progress():
+    """Progress and partial results of the running analysis, redrawn on its own."""
+    try:
+        job = poll_analysis()
+    except requests.exceptions.RequestException as e:
+        st.warning(f"⚠️ Could not reach the backend, retrying: {e}")
+        return
+    if job["status"] in ("queued", "running"):
+        stage = f" (last finished: {job['stage']})" if job["stage"] else ""
+        st.progress(job["progress"] / 100, text=f"🔍 Analysis {job['status']}{stage}")
+    render_analysis_results(st.session_state.analysis_results)
+    if job["status"] in JOB_FINISHED_STATUSES:
+        # Stop polling: the whole page reruns once to show the outcome
+        st.rerun()
+
+
+def render_report_stream(job_id, project_description, retry=False):
+    """Show the report of an analysis job while the research crew writes it.
+
+    The crew checks its findings against the user's description of the
+    project. Each research section fills in as its tokens arrive, then the
+    report itself. The backend runs the crew once per job and description
+    and replays its events, so a rerun in the middle of the stream picks up
+    the same run. Returns (report, None), or (None, error) if the crew failed.
+    """
+    status = st.empty()
+    sections = st.container()
+    st.subheader("📊 Report")
+    report = st.empty()
+    placeholders, texts, last_redraw = {}, {}, {}
+    started = time.monotonic()
+    first_content = None
+
+    # The backend sends keep-alives while the model is busy, so a long read timeout is enough
+    with requests.get(f"{BACKEND_URL}/analyze/{job_id}/report", stream=True, timeout=(5, 120),
+                      params={"retry": retry, "description": project_description}) as response:
+        response.raise_for_status()
+        for event in iter_sse(response):
+            kind, task = event["event"], event.get("task")
+            if kind == "task_started" and task not in placeholders:
+                title = task.removesuffix("_research_task").replace("_", " ").title()
+                placeholders[task] = report if task == REPORT_TASK else \
+                    sections.expander(f"🔎 {title}", expanded=True).empty()
+                texts[task], last_redraw[task] = "", 0.0
+                status.info(f"✍️ Writing {title}...")
+            elif kind == "token" and task in placeholders:
+                if first_content is None:
+                    first_content = time.monotonic() - started
+                texts[task] += event["text"]
+                if time.monotonic() - last_redraw[task] >= STREAM_REDRAW_SECONDS:
+                    placeholders[task].markdown(task_text(texts[task]))
+                    last_redraw[task] = time.monotonic()
+            elif kind == "task_completed" and task in placeholders:
+                placeholders[task].markdown(event["output"])
+            elif kind == "report":
+                report.markdown(event["output"])
+                status.success(f"✅ Report complete in {time.monotonic() - started:.0f}s "
+                               f"(first content after {first_content or 0:.1f}s)")
+                return event["output"], None
+            elif kind == "error":
+                status.empty()
+                return None, event["error"]
+    return None, "The report stream ended early"
 
 
 # Register the cleanup function to be called when the session ends
@@ -109,18 +287,21 @@ st.markdown("#### Analyze your repository using AI-powered agents.")
 st.subheader("📥 Step 1: Enter Repository URL")
 repo_url = st.text_input(
     "🔗 Repository URL", "https://github.com/cosmos-127/portfolio_v1.git")
+# Partial and shallow mirrors are faster but some history metrics become unavailable
+clone_mode = st.selectbox("⚙️ Clone mode", sorted(MIRROR_MODES), index=sorted(MIRROR_MODES).index("full"))
 
 if st.button("📥 Clone Repository"):
-    if os.path.exists(local_path):
-        cleanup_repo()
+    cleanup_repo()
 
-    message = clone_repository(repo_url, local_path)
+    # Reuses the mirror of this remote if one exists and only fetches new objects
+    message = ensure_mirror(repo_url, mode=clone_mode)
     add_alert("repo", message, "success" if "successfully" in message else "error")
 
     display_alerts("repo")  # Show alerts immediately
 
     if "successfully" in message:
-        st.session_state.branches = get_branches(local_path)
+        st.session_state.repo_url = repo_url
+        st.session_state.branches = cached_branches(repo_url, get_commit_sha(get_mirror_path(repo_url)))
         st.session_state.repo_cloned = True
         st.session_state.current_step = 2
 
@@ -133,9 +314,15 @@ if st.session_state.repo_cloned:
         "Choose a branch", st.session_state.branches)
 
     if st.button("✅ Confirm Branch"):
-        message = checkout_branch(local_path, selected_branch)
-        add_alert("branch", message,
-                  "success" if "Switched" in message else "error")
+        # Each analysis gets its own worktree instead of switching a shared checkout
+        cleanup_repo()
+        worktree_path = add_worktree(st.session_state.repo_url, selected_branch)
+        if worktree_path:
+            st.session_state.repo_path = worktree_path
+            local_path = worktree_path
+            add_alert("branch", f"Switched to branch {selected_branch}", "success")
+        else:
+            add_alert("branch", f"Error checking out branch: {selected_branch}", "error")
 
         st.session_state.selected_branch = selected_branch
         st.session_state.branch_selected = True
@@ -147,7 +334,10 @@ if st.session_state.branch_selected:
     st.subheader("📂 Step 3: Choose Subdirectories")
 
     if st.button("📂 Fetch Subdirectories"):
-        subdirs = list_subdirectories(local_path)
+        commit_sha = get_commit_sha(local_path)
+        # Without a commit (e.g. a failed checkout) there is nothing to key the cache on
+        subdirs = cached_subdirectories(st.session_state.repo_url, commit_sha, local_path) \
+            if commit_sha else list_subdirectories(local_path)
         if isinstance(subdirs, list):
             st.session_state.subdirs = subdirs
             st.session_state.subdirs_fetched = True
@@ -170,34 +360,23 @@ if st.session_state.branch_selected:
             # Make sure the selection is stored in session state
             st.session_state.selected_subdirs = set(selected_subdirs)
 
-            # Ensure any old zip is removed before creating a new one
-            output_zip = "selected_subdirs.zip"
-            if os.path.exists(output_zip):
-                os.remove(output_zip)
-
-            # Create a new zip file with the selected directories
-            zipper(local_path, st.session_state.selected_subdirs, output_zip)
-            st.session_state.zip_ready = os.path.exists(output_zip)
-            st.session_state.output_zip_path = output_zip  # Store zip path
+            # The archive is streamed by the backend on download, nothing is zipped up front
+            st.session_state.zip_ready = bool(st.session_state.selected_subdirs)
 
             if st.session_state.zip_ready:
                 add_alert(
-                    "subdirs", "✅ Subdirectories zipped successfully!", "success")
+                    "subdirs", "✅ Selection applied, ready to download!", "success")
 
             st.rerun()  # Ensure UI updates to reflect new zip file
 
     display_alerts("subdirs")  # Show alert before the download button
 
-    # Check if the zip is ready and display the download button
-    if st.session_state.zip_ready and os.path.exists(st.session_state.output_zip_path):
+    # Check if the selection is applied and link to the streaming archive
+    if st.session_state.zip_ready:
         st.subheader("📥 Download Selected Files")
-        with open(st.session_state.output_zip_path, "rb") as zip_file:
-            st.download_button(
-                label="📥 Download Files",
-                data=zip_file,
-                file_name="selected_subdirectories.zip",
-                mime="application/zip"
-            )
+        archive_query = urlencode(
+            {"worktree": get_worktree_id(local_path), "subdirs": sorted(st.session_state.selected_subdirs)}, doseq=True)
+        st.link_button("📥 Download Files", f"{BACKEND_URL}/archive?{archive_query}")
 
 
 # Step 4️⃣: Start Analysis
@@ -205,41 +384,48 @@ if st.session_state.zip_ready:
     st.subheader("🚀 Step 4: Start Analysis")
 
     project_description = st.text_area(
-        "📝 Enter Project Description", "Describe the tech stack or architecture..."
+        "📝 Enter Project Description", placeholder="Describe the tech stack or architecture..."
     )
 
-    # Ensure "Start Analysis" button remains visible
-    if "analysis_started" not in st.session_state:
-        st.session_state.analysis_started = False
+    job = st.session_state.analysis_job
+    running = st.session_state.analysis_job_id is not None and (
+        job is None or job["status"] not in JOB_FINISHED_STATUSES)
 
-    if not st.session_state.analysis_started:
-        if st.button("🚀 Start Analysis", key="start_analysis_button"):
-            if not project_description.strip():
-                st.warning(
-                    "⚠️ Please enter a project description before analyzing.")
-            else:
-                add_alert("analysis", "🔍 Analysis started!", "success")
-                st.session_state.analysis_started = True
-                st.rerun()  # Refresh UI to show progress message
-
-    if st.session_state.analysis_started:
-        with st.spinner("🔍 Analyzing tech stack..."):
+    # The analysis runs in the backend, so the button returns at once and the page stays usable
+    if not running and st.button("🚀 Start Analysis", key="start_analysis_button"):
+        if not project_description.strip():
+            st.warning(
+                "⚠️ Please enter a project description before analyzing.")
+        else:
+            submit_analysis(project_description)
+            st.rerun()  # Refresh UI to show progress message
+
+    display_alerts("analysis")
+
+    if running:
+        st.fragment(analysis_progress, run_every=ANALYSIS_POLL_SECONDS)()
+    elif job is not None and job["status"] == "succeeded":
+        st.success("✅ Analysis Complete!")
+        st.subheader("📊 Analysis Results")
+        render_analysis_results(st.session_state.analysis_results)
+        if st.session_state.report:
+            st.subheader("📊 Report")
+            st.markdown(st.session_state.report)
+        elif st.session_state.report_error and not st.button("🔁 Retry Report", key="retry_report_button"):
+            # A failed run is not started again on every rerun, only on request
+            st.error(f"❌ Report generation failed: {st.session_state.report_error}")
+        else:
+            retry = st.session_state.report_error is not None
             try:
-                response = requests.get(
-                    "http://localhost:8000/api/analyze-git-summary",
-                    params={"query": project_description}
-                )
-
-                if response.status_code == 200:
-                    st.success("✅ Analysis Complete!")
-                    st.subheader("📊 Analysis Results")
-                    st.json(response.json())  # Display formatted JSON response
-                else:
-                    st.error(
-                        f"❌ Error {response.status_code}: {response.text}")
-
+                # The report is shown as it is written instead of after the whole crew finishes
+                st.session_state.report, st.session_state.report_error = render_report_stream(
+                    st.session_state.analysis_job_id, st.session_state.project_description, retry)
             except requests.exceptions.RequestException as e:
-                st.error(f"❌ Failed to connect to backend: {e}")
+                st.session_state.report_error = f"Failed to connect to backend: {e}"
+            if st.session_state.report_error:
+                st.rerun()
+    elif job is not None:
+        st.error(f"❌ Analysis {job['status']}: {job['error']}")
 
 
 atexit.register(cleanup_repo)
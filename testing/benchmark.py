@@ -0,0 +1,173 @@
+"""Benchmark the analysis engines on synthetic repositories of several sizes.
+
+Run from the project root:
+
+    python testing/benchmark.py --tiers small medium --output benchmark_results.json
+
+Every tier is generated deterministically (see repo_generator.py), so results
+written by different releases can be compared directly.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(PROJECT_ROOT, "backend", "src"))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from repo_generator import create_bare_remote, generate_repository  # noqa: E402
+from backend.handlers.repo_handler import CLONE_MODES, measure_clone  # noqa: E402
+from backend.handlers.zip_handler import zipper  # noqa: E402
+from backend.report_gen_engines import language_engine  # noqa: E402
+from backend.report_gen_engines.branch_report import compare_branches  # noqa: E402
+from backend.report_gen_engines.file_index import build_file_index  # noqa: E402
+from backend.report_gen_engines.git_scrap_data_basic import get_git_info, HISTORY_STATE_DIR  # noqa: E402
+import blob_store  # noqa: E402  (on the path once report_gen_engines is imported)
+
+# Repository shapes per size tier
+TIERS = {
+    "small": {"commits": 100, "files": 200, "authors": 5, "branches": 2, "tags": 3, "depth": 3},
+    "medium": {"commits": 2000, "files": 3000, "authors": 25, "branches": 10, "tags": 20, "depth": 5},
+    "large": {"commits": 20000, "files": 30000, "authors": 100, "branches": 50, "tags": 100, "depth": 7},
+}
+# Detectors whose per-file results are kept in the blob store
+BLOB_STORE_DETECTORS = {language_engine.check_license_and_secrets, language_engine.get_code_quality_metrics}
+
+
+def time_call(func, *args, repeat=3, setup=None):
+    """Wall time of `repeat` calls in seconds; setup() runs untimed before each call."""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start_time = time.perf_counter()
+        func(*args)
+        runs.append(time.perf_counter() - start_time)
+    return {
+        "min": round(min(runs), 4),
+        "median": round(statistics.median(runs), 4),
+        "runs": [round(run, 4) for run in runs],
+    }
+
+
+def use_blob_store(path):
+    """Keep detector results in a store at path, instead of the one shared by every analysis."""
+    store = blob_store.get_blob_store()
+    store.close()
+    store.path = path
+
+
+def clear_blob_store():
+    """Delete the stored detector results, so the next run computes every file again."""
+    store = blob_store.get_blob_store()
+    store.close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(store.path + suffix):
+            os.remove(store.path + suffix)
+
+
+def benchmark_tier(name, shape, work_dir, repeat):
+    repo_path = os.path.join(work_dir, name)
+    start_time = time.perf_counter()
+    generate_repository(repo_path, seed=0, **shape)
+    generation_seconds = time.perf_counter() - start_time
+
+    history_state = os.path.join(repo_path, ".git", HISTORY_STATE_DIR)
+
+    def clear_caches():
+        shutil.rmtree(history_state, ignore_errors=True)
+        clear_blob_store()
+
+    file_index = build_file_index(repo_path)
+    timings = {
+        "file_index": time_call(build_file_index, repo_path, repeat=repeat),
+        # Cold: no stored history state; warm: incremental run with nothing new
+        "get_git_info_cold": time_call(
+            get_git_info, repo_path, repeat=repeat,
+            setup=lambda: shutil.rmtree(history_state, ignore_errors=True)),
+        "get_git_info_warm": time_call(get_git_info, repo_path, repeat=repeat),
+    }
+    for detector in [language_engine.get_language_usage, language_engine.detect_frameworks,
+                     language_engine.determine_project_architecture,
+                     language_engine.check_license_and_secrets, language_engine.check_testing_and_docs,
+                     language_engine.get_code_quality_metrics, language_engine.get_dependency_security_info]:
+        if detector not in BLOB_STORE_DETECTORS:
+            timings[detector.__name__] = time_call(detector, repo_path, file_index, repeat=repeat)
+            continue
+        # Cold: empty blob store; warm: every file's result is stored from the cold runs
+        timings[detector.__name__] = time_call(
+            detector, repo_path, file_index, repeat=repeat, setup=clear_blob_store)
+        timings[f"{detector.__name__}_warm"] = time_call(detector, repo_path, file_index, repeat=repeat)
+    # Cold: no history state nor stored detector results; warm: a rerun on the unchanged repository
+    timings["analyze_folder"] = time_call(
+        language_engine.analyze_folder, repo_path, None, repeat=repeat, setup=clear_caches)
+    timings["analyze_folder_warm"] = time_call(language_engine.analyze_folder, repo_path, None, repeat=repeat)
+    timings["compare_branches"] = time_call(compare_branches, repo_path, repeat=repeat)
+
+    subdirs = sorted(d for d in os.listdir(repo_path) if d != ".git"
+                     and os.path.isdir(os.path.join(repo_path, d)))
+    zip_path = os.path.join(work_dir, f"{name}.zip")
+    timings["zipper"] = time_call(zipper, repo_path, subdirs, zip_path, repeat=repeat)
+
+    remote_url = create_bare_remote(repo_path, os.path.join(work_dir, f"{name}.git"))
+    clones = {}
+    for mode in CLONE_MODES:
+        clone_path = os.path.join(work_dir, f"{name}-clone-{mode}")
+        clones[mode] = measure_clone(remote_url, clone_path, mode)
+        shutil.rmtree(clone_path, ignore_errors=True)
+
+    return {
+        "repository": {**shape, "generation_seconds": round(generation_seconds, 3)},
+        "timings": timings,
+        "clone": clones,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis engines.")
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--work-dir", help="Keep generated repositories here instead of a temp dir")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="analysis-bench-")
+    os.makedirs(work_dir, exist_ok=True)
+    use_blob_store(os.path.join(work_dir, "blob_results.sqlite3"))
+    git_version = subprocess.check_output(["git", "--version"], text=True).strip()
+
+    results = {
+        "metadata": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "engine_version": language_engine.ANALYSIS_ENGINE_VERSION,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": git_version,
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "tiers": {},
+    }
+    try:
+        for tier in args.tiers:
+            print(f"Benchmarking tier '{tier}'...")
+            results["tiers"][tier] = benchmark_tier(tier, TIERS[tier], work_dir, args.repeat)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
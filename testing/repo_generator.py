@@ -0,0 +1,152 @@
+"""Deterministic generator of synthetic git repositories for benchmarks.
+
+The same parameters and seed always produce the same commits (and SHAs), so
+timings can be compared across releases. History is written with a single
+`git fast-import` stream, which keeps generating large tiers cheap.
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+
+# Fixed epoch so generated commit dates (and SHAs) never depend on the clock
+BASE_TIMESTAMP = 1_600_000_000
+COMMIT_INTERVAL_SECONDS = 6 * 60 * 60
+
+EXTENSIONS = ["py", "js", "ts", "java", "go", "rs", "c", "cpp", "html", "css", "md", "json", "txt"]
+WORDS = ["alpha", "beta", "gamma", "delta", "value", "config", "result", "index", "token", "item"]
+
+
+def _random_content(rng, lines):
+    return "".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10))) + "\n"
+        for _ in range(lines)
+    )
+
+
+def _random_path(rng, depth, serial):
+    parts = [f"pkg{rng.randint(0, 7)}" for _ in range(rng.randint(0, depth))]
+    parts.append(f"file{serial}.{rng.choice(EXTENSIONS)}")
+    return "/".join(parts)
+
+
+class _FastImportStream:
+    def __init__(self):
+        self.chunks = []
+        self.next_mark = 1
+
+    def _data(self, text):
+        payload = text.encode("utf-8")
+        self.chunks.append(f"data {len(payload)}\n".encode("utf-8") + payload + b"\n")
+
+    def blob(self, content):
+        mark = self.next_mark
+        self.next_mark += 1
+        self.chunks.append(f"blob\nmark :{mark}\n".encode("utf-8"))
+        self._data(content)
+        return mark
+
+    def commit(self, ref, author, timestamp, message, changes, parent=None):
+        mark = self.next_mark
+        self.next_mark += 1
+        identity = f"{author} <{author.lower().replace(' ', '.')}@example.com> {timestamp} +0000"
+        self.chunks.append(
+            f"commit {ref}\nmark :{mark}\nauthor {identity}\ncommitter {identity}\n".encode("utf-8"))
+        self._data(message)
+        if parent is not None:
+            self.chunks.append(f"from :{parent}\n".encode("utf-8"))
+        for path, blob_mark in changes:
+            self.chunks.append(f"M 100644 :{blob_mark} {path}\n".encode("utf-8"))
+        self.chunks.append(b"\n")
+        return mark
+
+    def reset(self, ref, commit_mark):
+        self.chunks.append(f"reset {ref}\nfrom :{commit_mark}\n\n".encode("utf-8"))
+
+    def getvalue(self):
+        return b"".join(self.chunks)
+
+
+def generate_repository(path, commits=100, files=200, authors=5, branches=2, tags=3,
+                        depth=3, seed=0):
+    """Create a git repository at path with a checked-out default branch `main`."""
+    rng = random.Random(seed)
+    author_names = [f"Author {i}" for i in range(max(1, authors))]
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True)
+
+    stream = _FastImportStream()
+    timestamp = BASE_TIMESTAMP
+    paths = []
+
+    # The first commit creates the initial tree, later ones edit and add files
+    initial_files = max(1, files // 2)
+    changes = []
+    for serial in range(initial_files):
+        file_path = _random_path(rng, depth, serial)
+        paths.append(file_path)
+        changes.append((file_path, stream.blob(_random_content(rng, rng.randint(5, 60)))))
+    main_marks = [stream.commit("refs/heads/main", author_names[0], timestamp, "Initial commit", changes)]
+
+    remaining_new_files = files - initial_files
+    for number in range(1, max(1, commits)):
+        timestamp += rng.randint(1, COMMIT_INTERVAL_SECONDS * 2)
+        changes = []
+        for _ in range(rng.randint(1, 5)):
+            changes.append((rng.choice(paths), stream.blob(_random_content(rng, rng.randint(5, 60)))))
+        # Spread the remaining new files evenly across the history
+        new_files = remaining_new_files // (commits - number) if commits > number else 0
+        for _ in range(new_files):
+            file_path = _random_path(rng, depth, len(paths))
+            paths.append(file_path)
+            changes.append((file_path, stream.blob(_random_content(rng, rng.randint(5, 60)))))
+        remaining_new_files -= new_files
+        main_marks.append(stream.commit(
+            "refs/heads/main", rng.choice(author_names), timestamp, f"Change {number}",
+            changes, parent=main_marks[-1]))
+
+    for branch in range(branches):
+        parent = rng.choice(main_marks)
+        for number in range(rng.randint(1, 5)):
+            timestamp += rng.randint(1, COMMIT_INTERVAL_SECONDS)
+            change = (rng.choice(paths), stream.blob(_random_content(rng, rng.randint(5, 30))))
+            parent = stream.commit(
+                f"refs/heads/feature-{branch}", rng.choice(author_names), timestamp,
+                f"Feature {branch} change {number}", [change], parent=parent)
+
+    for tag in range(tags):
+        stream.reset(f"refs/tags/v{tag + 1}.0", main_marks[len(main_marks) * (tag + 1) // (tags + 1)])
+
+    subprocess.run(["git", "fast-import", "--quiet"], cwd=path, input=stream.getvalue(), check=True)
+    subprocess.run(["git", "reset", "-q", "--hard", "main"], cwd=path, check=True)
+    return path
+
+
+def create_bare_remote(repo_path, bare_path):
+    """Bare copy of a generated repository, usable as a file:// remote for clone benchmarks."""
+    if os.path.exists(bare_path):
+        shutil.rmtree(bare_path)
+    subprocess.run(["git", "clone", "-q", "--bare", repo_path, bare_path], check=True)
+    # Needed for blobless and treeless clones over file://
+    subprocess.run(["git", "config", "uploadpack.allowFilter", "true"], cwd=bare_path, check=True)
+    return "file://" + os.path.abspath(bare_path).replace(os.sep, "/")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic git repository.")
+    parser.add_argument("path")
+    parser.add_argument("--commits", type=int, default=100)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--authors", type=int, default=5)
+    parser.add_argument("--branches", type=int, default=2)
+    parser.add_argument("--tags", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_repository(args.path, args.commits, args.files, args.authors, args.branches,
+                        args.tags, args.depth, args.seed)
+    print(f"Generated repository at {args.path}")